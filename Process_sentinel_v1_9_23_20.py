@@ -4,10 +4,10 @@
 #The script will search for data that needs to be uncompressed, and will then
 #move all original data into a folder called 'Raw_data'.  The Raw_data folder will
 #then contain individual scene ID folders along with their compressed versions if they exist.
-#Once the raw data has been uncompressed and organized, parameter files will be generated.
-#The parameter files will be used to make a batch file, which will then be run in the
-#Windows command prompt, executing ERDAS modeler.exe (the script searches for the
-#proper path to this .exe file) to process the satellite data.
+#Once the raw data has been organized, the band images are read straight out of the
+#zip archives and the MSAVI, NDVI and WDRI products are computed with numpy/rasterio.
+#The per-scene stages run in parallel on a pool of worker processes (see
+#scene_scheduler.py), so ERDAS is no longer needed.
 #Written By...Nikit Parakh
 #.........parakhni@msu.edu
 
@@ -18,9 +18,60 @@ import pprint
 import shutil
 import zipfile
 
+import numpy
+
+import area_of_interest
+import band_cache
+import build_manifest
+import raster_io
+import run_report
+import scene_catalog
+import scene_scheduler
+import vegetation_indices
+
 # Global constant basePath points to the data's base directory based on location of this python script
 basePath = os.path.dirname(sys.argv[0]).replace("\\", "/")
 
+# Fused mode reads the band images once, straight out of the L1C zips, and computes
+# MSAVI/NDVI/WDRI from them in memory.  The stack (a VRT over the band images) is only
+# written if asked for.
+# Set FUSED_PIPELINE to False to write the stack first and compute each index from it
+# as a separate stage.
+FUSED_PIPELINE = True
+WRITE_STACK = False
+
+# Format of the index products: 'HFA' writes ERDAS .img files, 'COG' compressed
+# Cloud-Optimized GeoTIFFs (.tif) with overviews, typically several times smaller
+OUTPUT_FORMAT = 'HFA'
+
+# Storage of the index products: 'float32', or 'int16' holding the index x 10000 with the
+# scale declared in the file (half the size; fC and the SD/mean stage decode it)
+INDEX_STORAGE = 'float32'
+
+# Area of interest: None processes the whole tiles.  A (west, south, east, north) box in
+# degrees of longitude/latitude, or the path of a GeoJSON polygon file (relative to the
+# workspace), restricts every stage to the pixels covering it (see area_of_interest.py);
+# tiles outside it are skipped.
+AOI = None
+
+# Decoding the JPEG 2000 band images is the slowest read of the run, so each band is
+# decoded once into a tiled, uncompressed GeoTIFF in Band_cache/ (see band_cache.py)
+# and the fused stage reads that copy, on this and later runs, without decoding.
+# band_cache.CACHE_COMPRESS = 'ZSTD' halves the cache but decodes on every read.  Once the cache grows over
+# BAND_CACHE_MB, the least recently used bands are deleted.  With an AOI the bands are
+# not cached: only the part of each band covering the AOI is decoded.
+BAND_CACHE = True
+BAND_CACHE_MB = 20480
+
+# Worker processes and memory budget (MB) for the stages running at the same time
+WORKERS = os.cpu_count()
+MEMORY_BUDGET_MB = 4096
+
+# The timings of every stage are written to Report_stages.json/.csv in the workspace.
+# Set WRITE_TRACE to True to also write Report_trace.json, a timeline of the run that
+# opens in chrome://tracing or https://ui.perfetto.dev
+WRITE_TRACE = False
+
 # Check for data output directories and create if need be
 def CheckOutputDir():
     if not os.path.exists(basePath + '/Raw_data/'):
@@ -35,235 +86,131 @@ def CheckOutputDir():
         os.makedirs(basePath + '/WDRI/')
 
 
-def FindModelerExe():
-    if not os.path.exists(basePath + '/modeler_location.txt'):
-        f = open(basePath + '/modeler_location.txt', 'w')
-        searchdir = [] #list of possible ERDAS install locations
-        for root, dirs, files in os.walk('C:\Program Files\\'):
-            for dir in dirs:
-                if dir == 'Hexagon':
-                    searchdir.append(os.path.join(root, dir))
-                    print (os.path.join(root,dir))
-        for i in range (0, len(searchdir)):
-            for root, dirs, files in os.walk(searchdir[i]):
-                for exe in fnmatch.filter(files, '*.exe'):
-                    if exe == 'modeler.exe':
-                        modeler = os.path.join(root, exe)
-                    elif exe == 'imagecommand.exe':
-                        imagecommand = os.path.join(root, exe)
-                    elif exe == 'imgcopy.exe':
-                        imgcopy = os.path.join(root, exe)
-        modeler = '"' + modeler + '" @'
-        imagecommand = '"' + imagecommand + '" @'
-        imgcopy = '"' + imgcopy + '" @'
-
-        f.write("{}\n{}\n{}".format(modeler, imagecommand, imgcopy))
-        f.close()
-        return modeler, imagecommand, imgcopy
-    f = open(basePath + '/modeler_location.txt')
-    paths = []
-    for line in f:
-        paths.append(line.strip())
-    f.close()
-    return paths[0], paths[1], paths[2]
-
-
-# extract compressed data if necessary
-def ExtractData():
-    zipList = []
-    unzipped = []
-    for root, dirs, files in os.walk(basePath):
-        for zip in files:
-            if fnmatch.fnmatch(zip, "*.zip") and zip[:3] == "L1C":
-                zipList.append(os.path.join(root, zip).replace('\\', '/'))
-        for unzip in files:
-            if fnmatch.fnmatch(unzip, "*.jp2"):
-                if root.replace('\\', '/') not in unzipped:
-                    unzipped.append(root.replace('\\', '/'))
+#name suffixes of the Sentinel-2 bands used for processing, in stack order
+BANDS = ["_B02", "_B03", "_B04", "_B08"]
+
+
+#map each band suffix to its image member with a single pass over the zip listing
+def getZipBandMembers(z):
+    members = {}
+    for file in z.namelist():
+        #QI_DATA holds per-band masks whose names also end in _B02.jp2 etc.
+        if fnmatch.fnmatch(file, "*.jp2") and str(file)[-8:-4] in BANDS and '/QI_DATA/' not in file:
+            members[str(file)[-8:-4]] = file
+    return members
+
+
+# locate the band images of every scene.  Band members are opened straight from the
+# L1C zip through GDAL's /vsizip/ handler (stored members by offset, deflated ones
+# streamed), so nothing is extracted.  The workspace listing and the band members of
+# each zip come from the scene catalog; a zip is only opened if it is new or changed.
+def ExtractData(catalog):
+    catalog.refresh()
+    zipList = catalog.list_files(basePath, "L1C*.zip", recursive=True)
+    unzipped = sorted(set(os.path.dirname(jp2) for jp2 in catalog.list_files(basePath, "*.jp2", recursive=True)))
 
     combineLists = zipList + unzipped
-    zipList = []
 
     for i in combineLists:
         try:
             os.rename(i, basePath + '/Raw_data/' + os.path.basename(i))
             print(os.path.basename(i), "successfully moved to Raw_data")
-            if ".zip" in  os.path.basename(i):
-                zipList.append(basePath + '/Raw_data/' + os.path.basename(i))
-        except WindowsError:
+        except OSError:
             pass
     print()
-    for i in zipList:
-        folder_path = basePath + '/Raw_data/' + os.path.basename(i)[:-4]
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-
-        z = zipfile.ZipFile(i, 'r')
-        for file in z.namelist():
-            if fnmatch.fnmatch(file, "*.jp2"):
-                if str(file)[-8:-4] in ["_B02", "_B03", "_B04", "_B08"]:
-                    if str(file)[-8:-4] == "_B02":
-                        target = open(folder_path + '/' + folder_path.split('/')[-1] + "_B02.jp2", 'wb')
-                    elif str(file)[-8:-4] == "_B03":
-                        target = open(folder_path + '/' + folder_path.split('/')[-1] + "_B03.jp2", 'wb')
-                    elif str(file)[-8:-4] == "_B04":
-                        target = open(folder_path + '/' + folder_path.split('/')[-1] + "_B04.jp2", 'wb')
-                    elif str(file)[-8:-4] == "_B08":
-                        target = open(folder_path + '/' + folder_path.split('/')[-1] + "_B08.jp2", 'wb')
-                    target.write(z.read(file))
-                    target.close()
-        z.close()
-
-    sceneIDList, scenePathList = set(), set()
-    for root, dirs, files in os.walk(basePath + '/Raw_data/'):
-        for file in files:
-            if file.endswith('.jp2') and "L1C" in root:
-                scenePathList.add(root)
-                sceneIDList.add(root.split('/')[-1])
-
-    return list(sceneIDList), list(scenePathList)
-
-
-def getImageLists(namelist, pathlist):
-    #create empty lists to contain image paths, image names for Sentinel 2B scenes
-    S2BimagePath = []
-    S2BimageName = []
-
-    for i in range (0, len(namelist)):
-        if "L1C" in pathlist[i]:
-            S2BimagePath.append(pathlist[i])
-            S2BimageName.append(namelist[i])
-
-    return S2BimagePath, S2BimageName
-
-
-#*******Stack bands (DN's)*******
-#generate parameter files, use conditional statements to determine landsat 7 or 8 bands
-def GetParameterFilesStack(imagepath, imagename, modeler):
-    #determine number of individual scenes to be processed
-    numImages = len(imagename)
-    #create empty list that will contain parameter file info for batch file
-    batchList = []
-    for i in range(0, numImages):
-        if not os.path.exists(basePath + '/Stacks/' + imagename[i] + '_stack.img'):
-
-            #create parameter file for Sentinel 2B bands
-            if "L1C" in imagepath[i]:
-                f = open(imagepath[i] + "/" + imagename[i] + "_parameter_stackA", 'w')
-                f.write('SET CELLSIZE MIN;\n'\
-                    'SET WINDOW INTERSECTION;\n'\
-                    'SET AOI NONE;\n'\
-                    'INTEGER RASTER n1 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE EDGE FILL"'+ str(imagepath[i]) + '/' + str(imagename[i]) + '_B02.jp2";\n'\
-                    'INTEGER RASTER n2 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE EDGE FILL"'+ str(imagepath[i]) + '/' + str(imagename[i]) + '_B03.jp2";\n'\
-                    'INTEGER RASTER n3 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE EDGE FILL"'+ str(imagepath[i]) + '/' + str(imagename[i]) + '_B04.jp2";\n'\
-                    'INTEGER RASTER n4 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE EDGE FILL"'+ str(imagepath[i]) + '/' + str(imagename[i]) + '_B08.jp2";\n'\
-                    'INTEGER RASTER n5 FILE DELETE_IF_EXISTING PUBOUT USEALL ATHEMATIC 16 BIT UNSIGNED INTEGER"'+ basePath + '/Stacks/' + imagename[i] + '_stack.img";\n'
-                    'n5 = STACKLAYERS (n1, n2, n3, n4);\n'\
-                    'QUIT;')
-                f.close()
-                f = open(imagepath[i] + '/' + imagename[i] + '_parameter_stackB', 'w')
-                f.write('5\n'\
-                    'modeler\n'\
-                    '-nq\n'\
-                    + imagepath[i] + '/' + imagename[i] + '_parameter_stackA\n'\
-                    '-meter\n'\
-                    '-state\n')
-                f.close()
-                batchList.append(modeler + imagepath[i] + '/' + imagename[i] + '_parameter_stackB')
-
-    return batchList
-
-def MSAVI(imagepath, imagename, modeler):
-    numImages = len(imagename)
-    batchlist = []
-    for i in range (0, numImages):
-        if not os.path.exists(basePath + '/MSAVI/' + imagename[i] + '_msavi.img'):
-            f = open(imagepath[i] + '/' + imagename[i] + '_msavi_paramA', 'w')
-            f.write('Float RASTER n1 FILE OLD PUBINPUT "' + basePath + '/Stacks/' + imagename[i] +'_stack.img";\n'\
-            'Float RASTER n4_temp;\n'\
-            'Float RASTER n5_temp;\n'\
-            'Float RASTER n13 FILE DELETE_IF_EXISTING PUBOUT USEALL ATHEMATIC FLOAT SINGLE "' + basePath + '/MSAVI/' + imagename[i] +'_msavi.img";\n'\
-            'n5_temp = n1(4) * 1;\n'\
-            'n4_temp = n1(3) * 1;\n'\
-            '#define n10_memory Float(((2 * $n5_temp) + 1))\n'\
-            '#define n7_memory Float( ( (2 * $n5_temp) + 1 )  POWER 2 - 8 * ($n5_temp - $n4_temp) )\n'\
-            '#define n11_memory Float(SQRT ( $n7_memory ) )\n'\
-            'n13 = ($n10_memory - $n11_memory) / 2;\n'\
-            'QUIT;\n')
-            f.close()
-            f = open(imagepath[i] + '/' + imagename[i] + '_msavi_paramB', 'w')
-            f.write('5\n'\
-            'modeler\n'\
-            +str(imagepath[i]) + '/' + str(imagename[i]) + '_msavi_paramA\n'\
-            '-meter\n'\
-            '-state\n'\
-            '-delete_model\n')
-            f.close()
-            batchlist.append(modeler + str(imagepath[i]) + '/' + str(imagename[i]) + '_msavi_paramB')
-
-    return batchlist
-
-def NDVI(imagepath, imagename, modeler):
-    numImages = len(imagename)
-    batchlist = []
-    for i in range(0, numImages):
-        if not os.path.exists(basePath + '/NDVI/' + imagename[i] + '_ndvi.img'):
-            f = open(imagepath[i] + '/' + imagename[i] + '_ndvi_paramA', 'w')
-            f.write('Float RASTER n1 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE "' + basePath + '/Stacks/' + imagename[i] + '_stack.img";\n'\
-                    'Float RASTER n5 FILE NEW PUBOUT USEALL ATHEMATIC FLOAT SINGLE "' + basePath + '/NDVI/' + imagename[i] + '_ndvi.img";\n'\
-                    '#define n3_memory Float(EITHER 0 IF ( n1(4) + n1(3) == 0 ) OR ((n1(4) - n1(3)) / (n1(4) + n1(3)) )OTHERWISE )\n'\
-                    'n5 = EITHER 0 IF ( $n3_memory < -1 OR $n3_memory > 1 ) OR $n3_memory OTHERWISE ;\n'\
-                    'QUIT;\n')
-            f.close()
-            f = open(imagepath[i] + '/' + imagename[i] + '_ndvi_paramB', 'w')
-            f.write('5\n'\
-                    'modeler\n'\
-                    '-nq\n'\
-                    + imagepath[i] + '/' + imagename[i] + '_ndvi_paramA\n'\
-                    '-meter\n'\
-                    '-state\n')
-            f.close()
-            batchlist.append(modeler + imagepath[i] + '/' + imagename[i] + '_ndvi_paramB')
-
-    return batchlist
-
-def WDRI(imagepath, imagename, modeler):
-    numImages = len(imagename)
-    batchlist = []
-    for i in range(0, numImages):
-        if not os.path.exists(basePath + '/WDRI/' + imagename[i] + '_wdri.img'):
-            f = open(imagepath[i] + '/' + imagename[i] + '_wdri_paramA', 'w')
-            f.write('Float RASTER n1 FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE "' + basePath + '/Stacks/' + imagename[i] + '_stack.img";\n'\
-                    'Float RASTER n5 FILE NEW PUBOUT USEALL ATHEMATIC FLOAT SINGLE "' + basePath + '/WDRI/' + imagename[i] + '_wdri.img";\n'\
-                    '#define n3_memory Float(EITHER 0 IF ( n1(4) * 0.1 + n1(3) == 0 ) OR ((n1(4) * 0.1 - n1(3)) / (n1(4) * 0.1 + n1(3)) )OTHERWISE )\n'\
-                    'n5 = EITHER 0 IF ( $n3_memory < -1 OR $n3_memory > 1 ) OR $n3_memory OTHERWISE ;\n'\
-                    'QUIT;\n')
-            f.close()
-            f = open(imagepath[i] + '/' + imagename[i] + '_wdri_paramB', 'w')
-            f.write('5\n'\
-                    'modeler\n'\
-                    '-nq\n'\
-                    + imagepath[i] + '/' + imagename[i] + '_wdri_paramA\n'\
-                    '-meter\n'\
-                    '-state\n')
-            f.close()
-            batchlist.append(modeler + imagepath[i] + '/' + imagename[i] + '_wdri_paramB')
-
-    return batchlist
-
-def RunBatch():
-    try:
-        from subprocess import Popen
-        p = Popen("batch_process.bat", cwd=basePath)
-        stdout, stderr = p.communicate()
-    except WindowsError:
-        pass
-
-def getBatchFile(batchlist):
-    f = open(basePath + '/batch_process.bat', 'w')
-    for i in range (0, len(batchlist)):
-        f.write(str(batchlist[i]).replace('\\', '/') + '\n')
-    f.close()
+
+    catalog.refresh()
+    sceneIDList, scenePathList, sceneBandList = [], [], []
+    for zip_path in catalog.list_files(basePath + '/Raw_data', "L1C*.zip"):
+        zip = os.path.basename(zip_path)
+        if not catalog.is_current(zip[:-4], zip_path):
+            z = zipfile.ZipFile(zip_path, 'r')
+            members = getZipBandMembers(z)
+            z.close()
+            if len(members) != len(BANDS):
+                print(zip, "is missing band images, skipping")
+                continue
+            catalog.register_scene(zip[:-4], zip_path, \
+                dict((band, '/vsizip/' + zip_path + '/' + members[band]) for band in BANDS), BANDS)
+        bands = catalog.scene_bands(zip[:-4])
+        scenePathList.append(zip_path)
+        sceneBandList.append([bands[band] for band in BANDS])
+        sceneIDList.append(zip[:-4])
+
+    #scene folders that were delivered already unzipped
+    for root in sorted(set(os.path.dirname(jp2) for jp2 in catalog.list_files(basePath + '/Raw_data', "*.jp2", recursive=True))):
+        sceneID = root.split('/')[-1]
+        if "L1C" in root and sceneID not in sceneIDList:
+            bands = dict((band, root + '/' + sceneID + band + ".jp2") for band in BANDS)
+            if not catalog.is_current(sceneID, root):
+                catalog.register_scene(sceneID, root, bands, BANDS)
+            sceneIDList.append(sceneID)
+            scenePathList.append(root)
+            sceneBandList.append([bands[band] for band in BANDS])
+
+    catalog.refresh()
+    return sceneIDList, scenePathList, sceneBandList
+
+
+#build the per-scene stage graph.  Every stage lists its input and output files; main
+#leaves out the stages build_manifest finds up to date.
+#The stack is a VRT descriptor over the band images, so it costs no pixel copying.
+#  fused:  one stage per scene (stack only written if WRITE_STACK)
+#  staged: stack -> msavi, ndvi, wdri
+#With a band cache, a decode stage per band (shared by scenes with identical band
+#images) writes the cached copy the fused stage reads.  The fused stage still lists the
+#band images themselves as its inputs, and the stack always refers to them, so evicting
+#a cached band never makes the products out of date.
+#With an aoi every stage only covers its window, sized from the band headers.
+#the Sentinel products are computed from DNs, so the calibration step is the identity
+def getSceneStages(catalog, imagename, imagebands, cache=None, aoi=None):
+    stages = []
+    decoded = {}
+    scale = numpy.ones(len(BANDS), dtype=numpy.float32)
+    offset = numpy.zeros(len(BANDS), dtype=numpy.float32)
+    # each worker processes its rasters in blocks within its share of the memory budget
+    blockMemory = MEMORY_BUDGET_MB * 1024 ** 2 // WORKERS
+    ext = raster_io.FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+    for i in range(0, len(imagename)):
+        stackPath = basePath + '/Stacks/' + imagename[i] + '_stack.vrt'
+        scene = catalog.scene(imagename[i])
+        width, height = scene['width'], scene['height']
+        if aoi:
+            width, height = raster_io.aoi_size(imagebands[i][0], aoi)
+            if not width:
+                print(imagename[i], 'skipped: outside the area of interest')
+                continue
+        pixels = width * height
+        indexPaths = dict((index, basePath + '/' + index.upper() + '/' + imagename[i] + '_' + index + ext) \
+            for index in ['msavi', 'ndvi', 'wdri'])
+
+        if WRITE_STACK or not FUSED_PIPELINE:
+            stages.append(scene_scheduler.Stage(imagename[i] + ':stack', raster_io.build_virtual_stack, \
+                (imagebands[i], stackPath, aoi), inputs=imagebands[i], outputs=[stackPath], pixels=pixels))
+
+        if FUSED_PIPELINE:
+            bands, deps = imagebands[i], []
+            if cache:
+                bands = [cache.path(band) for band in imagebands[i]]
+                for j in range(0, len(BANDS)):
+                    if bands[j] not in decoded:
+                        decoded[bands[j]] = imagename[i] + ':decode' + BANDS[j]
+                        stages.append(scene_scheduler.Stage(decoded[bands[j]], band_cache.decode_band, \
+                            (imagebands[i][j], bands[j]), memory=raster_io.block_memory(width, height, 1, blockMemory), \
+                            inputs=[imagebands[i][j]], outputs=[bands[j]], pixels=pixels))
+                    deps.append(decoded[bands[j]])
+            stages.append(scene_scheduler.Stage(imagename[i] + ':fused', vegetation_indices.process_scene, \
+                (bands, list(range(0, len(BANDS))), scale, offset, indexPaths, None, None, None, INDEX_STORAGE, aoi), deps=deps, \
+                memory=raster_io.block_memory(width, height, 4 + 3, blockMemory), inputs=imagebands[i], \
+                outputs=list(indexPaths.values()), pixels=pixels))
+        else:
+            for index in indexPaths:
+                stages.append(scene_scheduler.Stage(imagename[i] + ':' + index, vegetation_indices.index_scene, \
+                    (stackPath, index, indexPaths[index], INDEX_STORAGE, aoi), deps=[imagename[i] + ':stack'], \
+                    memory=raster_io.block_memory(width, height, 3, blockMemory), inputs=[stackPath], outputs=[indexPaths[index]], \
+                    pixels=pixels))
+    return stages
+
 
 def main():
     print("Script created by: Nikit Parakh")
@@ -276,37 +223,40 @@ Only bands 2, 3, 4, and 8 are used for this processing.\n')
     print ('The workspace directory is: ', basePath, '\n')
 
     CheckOutputDir()
-    imageNamelist, imagePathlist = ExtractData()
-
-    print ('Searching for ERDAS .exe file location')
-    ModelerLocation, ImageCommandLocation, ImgCopyLocation = FindModelerExe()
-    print ('Done Searching')
-    print (ModelerLocation)
-    print (ImageCommandLocation)
-    print (ImgCopyLocation)
+    report = run_report.RunReport()
+    catalog = scene_catalog.SceneCatalog(basePath)
+    with report.phase('ingest'):
+        imageNamelist, imagePathlist, imageBandlist = ExtractData(catalog)
 
-    print ("\nRaw data folders: \n")
+    print ("\nRaw data: \n")
     pprint.pprint(imagePathlist)
     print ("\nImages to be processed are: \n")
     pprint.pprint(imageNamelist)
     print ()
 
-    imagepath, imagename = getImageLists(imageNamelist, imagePathlist)
-
-    #Stack
-    batchListStack = GetParameterFilesStack(imagePathlist, imageNamelist, ModelerLocation)
-    #___MSAVI
-    batchListMSAVI = MSAVI(imagePathlist, imageNamelist, ModelerLocation)
-    #___NDVI
-    batchListNDVI = NDVI(imagePathlist, imageNamelist, ModelerLocation)
-    #___NDVI
-    batchListWDRI = WDRI(imagePathlist, imageNamelist, ModelerLocation)
-    # #compile all batch lists for atmospheric corrections and pass to the function that generates the batch file
-    Batchlist = batchListStack + batchListMSAVI + batchListNDVI + batchListWDRI
-
-    getBatchFile(Batchlist)
-    # #run the atmospheric correction batch file
-    print ('Running batch file in ERDAS modeler...')
-    RunBatch()
-
-main()
+    #___Band decode, stack, MSAVI, NDVI and WDRI stages for every scene
+    aoi = area_of_interest.load(AOI, basePath)
+    cache = None
+    if BAND_CACHE and not aoi:
+        cache = band_cache.BandCache(basePath + '/Band_cache', BAND_CACHE_MB * 1024 ** 2)
+    stages = getSceneStages(catalog, imageNamelist, imageBandlist, cache, aoi)
+
+    #Leave out the stages whose outputs are up to date according to the build manifest.
+    #A band is only decoded if a stage that runs needs it and it is not in the cache.
+    manifest = build_manifest.Manifest(basePath + '/manifest.jsonl')
+    decodes = [stage for stage in stages if stage.func is band_cache.decode_band]
+    pending = manifest.pending([stage for stage in stages if stage not in decodes])
+    needed = set(dep for stage in pending for dep in stage.deps)
+    pending = [stage for stage in decodes if stage.name in needed and not manifest.is_current(stage)] + pending
+    report.add_up_to_date(stages, pending)
+
+    print ('Running', len(pending), 'stages on', WORKERS, 'workers...')
+    scene_scheduler.run_stages(pending, WORKERS, MEMORY_BUDGET_MB * 1024 ** 2, manifest.record, report)
+    if cache:
+        cache.evict()
+    catalog.refresh()
+    catalog.close()
+    report.write(basePath + '/Report', WRITE_TRACE)
+
+if __name__ == '__main__':
+    main()
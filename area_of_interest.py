@@ -0,0 +1,47 @@
+#Area of interest (AOI) the processing can be restricted to, in place of the 'SET AOI
+#NONE' of the ERDAS models.  The scripts' AOI setting is either a (west, south, east,
+#north) box in degrees of longitude/latitude, or the path of a GeoJSON file of polygons
+#(in the CRS the file names, longitude/latitude by default).  load turns it into a plain
+#dict, {'crs': ..., 'geometries': [GeoJSON geometries]}, which the scripts pass to the
+#stages, so changing the AOI makes their outputs out of date in the build manifest.
+#A stage restricted to an AOI works on raster_io.clip_grid(grid, aoi): the pixels of
+#its input grid covering the AOI's bounding box, worked out from the raster header
+#alone.  It reads and writes only that window, and its outputs are on the clipped grid.
+#Pixels of the window outside the polygons are processed as usual; the AOI only limits
+#the extent.
+
+import json
+import os
+
+#points per side of an AOI box, so the box's edges stay edges once projected
+BOX_EDGE_POINTS = 16
+
+
+#polygon of a (west, south, east, north) box with its sides densified
+def _box(west, south, east, north):
+    steps = [i / float(BOX_EDGE_POINTS) for i in range(0, BOX_EDGE_POINTS)]
+    ring = [[west + (east - west) * t, south] for t in steps] + [[east, south + (north - south) * t] for t in steps] + \
+        [[east - (east - west) * t, north] for t in steps] + [[west, north - (north - south) * t] for t in steps]
+    return {'type': 'Polygon', 'coordinates': [ring + [ring[0]]]}
+
+
+#AOI dict of an AOI setting (None for no AOI); relative GeoJSON paths are taken from folder
+def load(spec, folder=None):
+    if spec is None:
+        return None
+    if not isinstance(spec, str):
+        return {'crs': 'EPSG:4326', 'geometries': [_box(*[float(v) for v in spec])]}
+    path = spec if os.path.isabs(spec) or folder is None else os.path.join(folder, spec)
+    f = open(path, 'r')
+    data = json.load(f)
+    f.close()
+    crs = data.get('crs', {}).get('properties', {}).get('name', 'EPSG:4326')
+    if data['type'] == 'FeatureCollection':
+        geometries = [feature['geometry'] for feature in data['features'] if feature.get('geometry')]
+    elif data['type'] == 'Feature':
+        geometries = [data['geometry']]
+    else:
+        geometries = [data]
+    if not geometries:
+        raise ValueError(path + ' holds no AOI geometry')
+    return {'crs': crs, 'geometries': geometries}
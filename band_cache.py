@@ -0,0 +1,137 @@
+#Decode-once cache of the Sentinel-2 JPEG 2000 band images.  Decoding JP2 is by far
+#the most expensive read of the Sentinel path, so every band image is converted once
+#into a tiled GeoTIFF in the cache folder and all later stages and reruns read that
+#copy.  By default (CACHE_COMPRESS = 'NONE') the tiles are stored uncompressed, so a
+#read is a plain copy of the bytes (GDAL can even memory-map the file) and costs no
+#decoding at all.  A codec such as 'ZSTD' makes the cache about half the size (and
+#lets BAND_CACHE_MB hold about twice as many bands), but every read of a tile then
+#decodes it again, fast as that is compared with JPEG 2000.
+#Entries are keyed by a hash of the source image's bytes, so an unchanged band that
+#was moved or re-zipped keeps its entry and a changed one gets a new entry.  The hash
+#of each source is remembered with the source's size and mtime, so only new or changed
+#sources are read for hashing.  Once the cache holds more than its size limit, the
+#least recently used entries are deleted.
+#The index (cache_index.json in the cache folder) is only used by the main process;
+#the decode stages run in the workers and only write their entry's file.
+
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import rasterio
+import rasterio.shutil
+
+import build_manifest
+
+INDEX_NAME = 'cache_index.json'
+
+#Compression of the cached bands: 'NONE' (no decoding on read), or 'ZSTD' (fast),
+#'LZW' or 'DEFLATE' for a smaller cache that is decoded on every read
+CACHE_COMPRESS = 'NONE'
+#Tile size of the cached bands
+CACHE_BLOCKSIZE = 512
+
+HASH_CHUNK = 1024 ** 2
+
+
+#zip archive and member of a /vsizip/ path
+def _split_vsizip(path):
+    path = path[len('/vsizip/'):]
+    end = path.lower().find('.zip') + len('.zip')
+    return path[:end], path[end + 1:]
+
+
+#sha1 of the bytes of an image file or /vsizip/ member
+def content_hash(path):
+    digest = hashlib.sha1()
+    archive = None
+    if path.startswith('/vsizip/'):
+        zipPath, member = _split_vsizip(path)
+        archive = zipfile.ZipFile(zipPath, 'r')
+        f = archive.open(member)
+    else:
+        f = open(path, 'rb')
+    chunk = f.read(HASH_CHUNK)
+    while chunk:
+        digest.update(chunk)
+        chunk = f.read(HASH_CHUNK)
+    f.close()
+    if archive:
+        archive.close()
+    return digest.hexdigest()
+
+
+#decode the band image at source into a tiled GeoTIFF at cache_path; run as a stage
+def decode_band(source, cache_path):
+    options = {'TILED': 'YES', 'BLOCKXSIZE': CACHE_BLOCKSIZE, 'BLOCKYSIZE': CACHE_BLOCKSIZE,
+               'BIGTIFF': 'IF_SAFER', 'COMPRESS': CACHE_COMPRESS}
+    if CACHE_COMPRESS != 'NONE':
+        options['PREDICTOR'] = 2
+    if CACHE_COMPRESS == 'ZSTD':
+        options['ZSTD_LEVEL'] = 1
+    partial = cache_path + '.partial'
+    rasterio.shutil.copy(source, partial, driver='GTiff', **options)
+    os.replace(partial, cache_path)
+
+
+class BandCache(object):
+    def __init__(self, folder, max_bytes):
+        self.folder = folder.replace('\\', '/')
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        #sources: path -> [size, mtime, hash]; entries: hash -> last time used
+        self.index = {'sources': {}, 'entries': {}}
+        try:
+            f = open(self.folder + '/' + INDEX_NAME, 'r')
+            self.index = json.load(f)
+            f.close()
+        except (IOError, ValueError):
+            pass
+
+    def _hash(self, source):
+        state = build_manifest.file_state(source)
+        known = self.index['sources'].get(source)
+        if known and state and known[:2] == state:
+            return known[2]
+        digest = content_hash(source)
+        self.index['sources'][source] = state + [digest]
+        return digest
+
+    #cache file of the band image at source (which may not exist yet), marked as used now
+    def path(self, source):
+        digest = self._hash(source)
+        self.index['entries'][digest] = time.time()
+        return self.folder + '/' + digest + '.tif'
+
+    def save(self):
+        path = self.folder + '/' + INDEX_NAME
+        f = open(path + '.tmp', 'w')
+        json.dump(self.index, f)
+        f.close()
+        os.replace(path + '.tmp', path)
+
+    #delete least recently used entries until the cache is within max_bytes, then save
+    #the index; only call this while no stage is using the cache.  Partial files left
+    #by a decode stage that crashed are deleted as well.
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            digest, ext = os.path.splitext(name)
+            if ext == '.partial':
+                os.remove(self.folder + '/' + name)
+                print('Band cache: removed unfinished', name)
+            elif ext == '.tif' and '.' not in digest:
+                entries.append((self.index['entries'].get(digest, 0), digest, os.path.getsize(self.folder + '/' + name)))
+        total = sum(size for used, digest, size in entries)
+        for used, digest, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(self.folder + '/' + digest + '.tif')
+            self.index['entries'].pop(digest, None)
+            total -= size
+            print('Band cache: evicted', digest)
+        self.save()
+        return total
@@ -0,0 +1,480 @@
+#Synthetic-scene benchmark of the processing stages.
+#A scratch workspace is filled with synthetic data of the requested size:
+#  - Landsat 4 TM, 5 TM, 7 ETM+ and 8 OLI scenes (band GeoTIFFs and MTL file); every
+#    other scene is delivered as a .tar.gz archive, the rest as an unpacked folder
+#  - Sentinel-2 L1C zips holding the 10 m band JPEG-2000 images
+#  - Fmask rasters, an NDVI mosaic and an ndvi_mos_gp time series
+#and then every stage is timed: ingest (ExtractData of both scripts), MTL parsing,
+#stacking, TOA, indices (staged and fused), masking, mosaicking of the masked NDVI,
+#fC (vi_to_fc), gap-filling of the time series and temporal stats (stack_sd_mean).  Each stage runs in a fresh Python process, so its peak
+#memory and I/O counters are its own.  For every stage the results hold the wall
+#and CPU time, the pixels processed (width x height of every scene, mosaic or time
+#series layer the stage works through), MPix/s, the peak RSS and the bytes
+#read/written (logical, and from/to storage where the OS reports it).
+#The results are written as JSON; --compare prints the change against an earlier
+#results file.
+#Usage: python benchmark.py [--size 2048] [--scenes 1] [--dates 10] [--workers 1]
+#                           [--stages toa,fused] [--output benchmark_results.json]
+#                           [--compare old_results.json] [--workspace DIR] [--keep]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import raster_io
+import toa_reflectance
+import vegetation_indices
+
+PLAN_NAME = 'benchmark_plan.json'
+
+#Scene ID prefix -> sensor key of the Landsat script, DN type of the band files
+LANDSAT = {
+    'LT04': ('LT4', 'uint8'),
+    'LT05': ('LT5', 'uint8'),
+    'LE07': ('LE7', 'uint8'),
+    'LC08': ('LC08', 'uint16'),
+}
+
+SENTINEL_BANDS = ['_B02', '_B03', '_B04', '_B08']
+
+#stage name -> stages whose outputs it needs, in the order the stages are run
+STAGES = [
+    ('ingest_landsat', []),
+    ('ingest_sentinel', []),
+    ('metadata', ['ingest_landsat']),
+    ('stack', ['ingest_landsat']),
+    ('toa', ['stack']),
+    ('indices', ['toa']),
+    ('fused', ['ingest_landsat']),
+    ('mask', ['indices']),
+    ('mosaic', ['mask']),
+    ('fc', []),
+    ('gap_fill', []),
+    ('temporal_stats', []),
+]
+
+
+def _profile(dtype):
+    return {'driver': 'GTiff', 'dtype': dtype, 'count': 1, 'crs': 'EPSG:32616',
+            'transform': from_origin(500000, 4500000, 30, 30)}
+
+
+def _write_raster(path, values, driver='GTiff'):
+    profile = _profile(values.dtype.name)
+    profile['driver'] = driver
+    with rasterio.open(path, 'w', width=values.shape[1], height=values.shape[0], **profile) as dst:
+        dst.write(values, 1)
+
+
+#DNs with a fill border, as on the edges of a real scene
+def _band_values(rng, size, dtype, band):
+    high = 255 if dtype == 'uint8' else 30000
+    values = rng.integers(high // 8, high, (size, size)).astype(dtype)
+    values[:, :size // 20 + 1] = 0
+    values[:size // 40 + 1] = 0
+    return values
+
+
+def _mtl_text(sceneID, date):
+    lines = ['GROUP = L1_METADATA_FILE', '  GROUP = PRODUCT_METADATA',
+             '    LANDSAT_SCENE_ID = "' + sceneID + '"', '    DATE_ACQUIRED = ' + date,
+             '  END_GROUP = PRODUCT_METADATA', '  GROUP = IMAGE_ATTRIBUTES',
+             '    SUN_ELEVATION = 55.12345678', '    EARTH_SUN_DISTANCE = 1.0166786',
+             '  END_GROUP = IMAGE_ATTRIBUTES', '  GROUP = MIN_MAX_RADIANCE']
+    for b in range(1, 12):
+        lines += ['    RADIANCE_MAXIMUM_BAND_%d = 191.600' % b, '    RADIANCE_MINIMUM_BAND_%d = -6.200' % b]
+    lines += ['  END_GROUP = MIN_MAX_RADIANCE', '  GROUP = RADIOMETRIC_RESCALING']
+    for b in range(1, 12):
+        lines += ['    RADIANCE_MULT_BAND_%d = 1.2673E-02' % b, '    RADIANCE_ADD_BAND_%d = -63.36577' % b,
+                  '    REFLECTANCE_MULT_BAND_%d = 2.0000E-05' % b, '    REFLECTANCE_ADD_BAND_%d = -0.100000' % b]
+    lines += ['  END_GROUP = RADIOMETRIC_RESCALING', 'END_GROUP = L1_METADATA_FILE', 'END']
+    return '\n'.join(lines) + '\n'
+
+
+#one Landsat scene in workspace, as a folder or packed into a .tar.gz
+def make_landsat_scene(workspace, prefix, index, size, archive):
+    sensor, dtype = LANDSAT[prefix]
+    date = '2020%02d%02d' % (index % 12 + 1, index % 28 + 1)
+    sceneID = prefix + '_L1TP_016030_' + date + '_20200908_01_T1'
+    folder = os.path.join(workspace, sceneID)
+    os.makedirs(folder)
+    rng = np.random.default_rng(index)
+    for band in toa_reflectance.STACK_BANDS[sensor]:
+        _write_raster(os.path.join(folder, sceneID + '_B' + str(band) + '.TIF'), _band_values(rng, size, dtype, band))
+    f = open(os.path.join(folder, sceneID + '_MTL.txt'), 'w')
+    f.write(_mtl_text(sceneID, date[:4] + '-' + date[4:6] + '-' + date[6:]))
+    f.close()
+    if archive:
+        tar = tarfile.open(folder + '.tar.gz', 'w:gz', compresslevel=1)
+        for name in sorted(os.listdir(folder)):
+            tar.add(os.path.join(folder, name), name)
+        tar.close()
+        shutil.rmtree(folder)
+    return {'id': sceneID, 'sensor': sensor}
+
+
+#one Sentinel-2 L1C zip in workspace with the bands the Sentinel script reads
+def make_sentinel_zip(workspace, index, size):
+    stamp = '202007%02dT163901' % (index % 28 + 1)
+    sceneID = 'L1C_T16TDM_A%06d_%s' % (26000 + index, stamp)
+    tmpDir = tempfile.mkdtemp(dir=workspace)
+    rng = np.random.default_rng(1000 + index)
+    z = zipfile.ZipFile(os.path.join(workspace, sceneID + '.zip'), 'w', zipfile.ZIP_STORED)
+    for band in SENTINEL_BANDS:
+        path = os.path.join(tmpDir, 'T16TDM_' + stamp + band + '.jp2')
+        _write_raster(path, _band_values(rng, size, 'uint16', band), 'JP2OpenJPEG')
+        z.write(path, sceneID + '.SAFE/GRANULE/' + sceneID + '/IMG_DATA/' + os.path.basename(path))
+    z.close()
+    shutil.rmtree(tmpDir)
+    return sceneID
+
+
+def make_workspace(workspace, size, scenes, dates, workers):
+    plan = {'size': size, 'workers': workers, 'landsat': [], 'sentinel': [], 'mosaic': None, 'series': []}
+    count = 0
+    for prefix in sorted(LANDSAT):
+        for i in range(0, scenes):
+            plan['landsat'].append(make_landsat_scene(workspace, prefix, count, size, count % 2 == 0))
+            count += 1
+    for i in range(0, scenes):
+        plan['sentinel'].append(make_sentinel_zip(workspace, i, size))
+
+    rng = np.random.default_rng(2000)
+    os.makedirs(os.path.join(workspace, 'FMask_data'))
+    for scene in plan['landsat']:
+        _write_raster(os.path.join(workspace, 'FMask_data', scene['id'] + '_MTLFmask.img'),
+                      rng.choice(np.array([0, 0, 0, 1, 2, 4], dtype=np.uint8), (size, size)), 'HFA')
+    os.makedirs(os.path.join(workspace, 'NDVI', 'ndvi_mosaic'))
+    ndvi = rng.uniform(-0.2, 0.9, (size, size)).astype(np.float32)
+    ndvi[:, :size // 20 + 1] = 0
+    plan['mosaic'] = os.path.join(workspace, 'NDVI', 'ndvi_mosaic', 'bench_ndvi_mos.img')
+    _write_raster(plan['mosaic'], ndvi, 'HFA')
+    os.makedirs(os.path.join(workspace, 'NDVI', 'ndvi_mos_gp'))
+    for d in range(0, dates):
+        path = os.path.join(workspace, 'NDVI', 'ndvi_mos_gp', 'bench%02d_ndvi_mos_gp.img' % d)
+        _write_raster(path, rng.integers(0, 200, (size, size)).astype(np.uint8), 'HFA')
+        plan['series'].append(path)
+
+    f = open(os.path.join(workspace, PLAN_NAME), 'w')
+    json.dump(plan, f, indent=1)
+    f.close()
+    return plan
+
+
+#---stages, run in the child process; each returns the pixels it processed---
+def _landsat_script(workspace, plan):
+    import Process_landsat8_v8_9_30_20 as landsat
+    landsat.basePath = workspace
+    landsat.WORKERS = plan['workers']
+    landsat.CheckOutputDir()
+    return landsat
+
+
+def _scene_paths(workspace, scene):
+    folder = workspace + '/Raw_data/' + scene['id'] + '/'
+    bands = [folder + scene['id'] + '_B' + str(b) + '.TIF' for b in toa_reflectance.STACK_BANDS[scene['sensor']]]
+    toaBands = [toa_reflectance.STACK_BANDS[scene['sensor']].index(b) for b in toa_reflectance.BANDS[scene['sensor']]]
+    scale, offset = toa_reflectance.toa_coefficients(scene['sensor'], [0.8] * 6, [-2.0] * 6, 1.0, 55.0)
+    return bands, toaBands, scale, offset
+
+
+def _products(workspace, scene, folder):
+    return dict((index, workspace + '/' + folder + '/' + scene['id'] + '_' + index + '.img')
+                for index in vegetation_indices.INDICES)
+
+
+def stage_ingest_landsat(workspace, plan):
+    import scene_catalog
+    landsat = _landsat_script(workspace, plan)
+    catalog = scene_catalog.SceneCatalog(workspace)
+    landsat.ExtractData(catalog)
+    catalog.close()
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_ingest_sentinel(workspace, plan):
+    import scene_catalog
+    import Process_sentinel_v1_9_23_20 as sentinel
+    sentinel.basePath = workspace
+    sentinel.CheckOutputDir()
+    catalog = scene_catalog.SceneCatalog(workspace)
+    sentinel.ExtractData(catalog)
+    catalog.close()
+    return len(plan['sentinel']) * plan['size'] ** 2
+
+
+def stage_metadata(workspace, plan):
+    import mtl_metadata
+    paths = [workspace + '/Raw_data/' + s['id'] + '/' + s['id'] + '_MTL.txt' for s in plan['landsat']]
+    mtl_metadata.read_records(paths, workspace + '/mtl_cache.json')
+    return 0
+
+
+def stage_stack(workspace, plan):
+    os.makedirs(workspace + '/Stacks', exist_ok=True)
+    for scene in plan['landsat']:
+        bands = _scene_paths(workspace, scene)[0]
+        raster_io.build_virtual_stack(bands, workspace + '/Stacks/' + scene['id'] + '_stack.vrt')
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_toa(workspace, plan):
+    os.makedirs(workspace + '/Toa_ref', exist_ok=True)
+    for scene in plan['landsat']:
+        bands, toaBands, scale, offset = _scene_paths(workspace, scene)
+        toa_reflectance.calibrate_scene(workspace + '/Stacks/' + scene['id'] + '_stack.vrt',
+                                        [b + 1 for b in toaBands], scale, offset,
+                                        workspace + '/Toa_ref/' + scene['id'] + '_toa.img')
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_indices(workspace, plan):
+    for scene in plan['landsat']:
+        for index, path in _products(workspace, scene, 'staged').items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            vegetation_indices.index_scene(workspace + '/Toa_ref/' + scene['id'] + '_toa.img', index, path)
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_fused(workspace, plan):
+    os.makedirs(workspace + '/fused', exist_ok=True)
+    for scene in plan['landsat']:
+        bands, toaBands, scale, offset = _scene_paths(workspace, scene)
+        vegetation_indices.process_scene(bands, toaBands, scale, offset, _products(workspace, scene, 'fused'))
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_mask(workspace, plan):
+    for scene in plan['landsat']:
+        vegetation_indices.mask_scene(_products(workspace, scene, 'staged')['ndvi'],
+                                      workspace + '/FMask_data/' + scene['id'] + '_MTLFmask.img',
+                                      workspace + '/staged/' + scene['id'] + '_ndvi_masked.img')
+    return len(plan['landsat']) * plan['size'] ** 2
+
+
+def stage_mosaic(workspace, plan):
+    import scene_mosaic
+    paths = [workspace + '/staged/' + scene['id'] + '_ndvi_masked.img' for scene in plan['landsat']]
+    grid = scene_mosaic.grid_of(paths)
+    scene_mosaic.mosaic_scenes(paths, workspace + '/staged/bench_ndvi_mos.img')
+    return grid.width * grid.height
+
+
+def stage_fc(workspace, plan):
+    import vi_to_fc
+    vi_to_fc.basePath = workspace
+    vi_to_fc.CheckOutputDir()
+    vi_to_fc.generate_fc([(plan['mosaic'], 'bench')])
+    return plan['size'] ** 2
+
+
+def stage_gap_fill(workspace, plan):
+    import temporal_stats
+    os.makedirs(workspace + '/gap_fill', exist_ok=True)
+    outputs = [workspace + '/gap_fill/' + os.path.basename(path) for path in plan['series']]
+    temporal_stats.gap_fill(plan['series'], [15 * d for d in range(0, len(plan['series']))], outputs)
+    return len(plan['series']) * plan['size'] ** 2
+
+
+def stage_temporal_stats(workspace, plan):
+    import stack_sd_mean
+    stack_sd_mean.basePath = workspace
+    stack_sd_mean.CheckOutputDir()
+    stack_sd_mean.generate_stats([(path, os.path.basename(path)[:-4]) for path in plan['series']])
+    return len(plan['series']) * plan['size'] ** 2
+
+
+#---measurement---
+def _io_counters():
+    try:
+        f = open('/proc/self/io', 'r')
+    except IOError:
+        return {}
+    counters = {}
+    for line in f:
+        key, sep, value = line.partition(':')
+        counters[key.strip()] = int(value)
+    f.close()
+    return counters
+
+
+def _cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    total = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+#peak resident memory in bytes of this process and its finished worker processes
+def _peak_rss():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    #bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+#run one stage in this process and write its measurements to result_path
+def measure_stage(name, workspace, result_path):
+    f = open(os.path.join(workspace, PLAN_NAME), 'r')
+    plan = json.load(f)
+    f.close()
+    func = globals()['stage_' + name]
+
+    io = _io_counters()
+    cpu = _cpu_seconds()
+    start = time.perf_counter()
+    pixels = func(workspace, plan)
+    seconds = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu
+    ioAfter = _io_counters()
+
+    def delta(key):
+        return ioAfter[key] - io[key] if key in io and key in ioAfter else None
+
+    result = {'stage': name, 'seconds': round(seconds, 4), 'cpu_seconds': round(cpu, 4), 'pixels': pixels,
+              'mpix_per_s': round(pixels / seconds / 1e6, 3) if pixels and seconds > 0 else None,
+              'peak_rss_bytes': _peak_rss(), 'bytes_read': delta('rchar'), 'bytes_written': delta('wchar'),
+              'storage_bytes_read': delta('read_bytes'), 'storage_bytes_written': delta('write_bytes')}
+    f = open(result_path, 'w')
+    json.dump(result, f)
+    f.close()
+
+
+#the selected stages plus the stages they need, in run order
+def stage_order(selected):
+    needed = set()
+    pending = list(selected)
+    deps = dict(STAGES)
+    while pending:
+        name = pending.pop()
+        if name not in deps:
+            raise ValueError('unknown stage ' + name)
+        if name not in needed:
+            needed.add(name)
+            pending.extend(deps[name])
+    return [name for name, _ in STAGES if name in needed]
+
+
+def run_stage(name, workspace, verbose):
+    resultPath = os.path.join(workspace, 'benchmark_' + name + '.json')
+    output = None if verbose else subprocess.DEVNULL
+    returncode = subprocess.call([sys.executable, os.path.abspath(__file__), '--measure', name, '--workspace', workspace],
+                                 stdout=output, stderr=output)
+    if returncode != 0:
+        return {'stage': name, 'error': 'exit status ' + str(returncode)}
+    f = open(resultPath, 'r')
+    result = json.load(f)
+    f.close()
+    os.remove(resultPath)
+    return result
+
+
+def _environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'rasterio': rasterio.__version__,
+            'gdal': rasterio.__gdal_version__}
+
+
+def _mb(value):
+    return '' if value is None else '%.1f' % (value / 1024 ** 2)
+
+
+def print_results(results):
+    print('%-16s %9s %9s %9s %10s %11s %11s' % ('stage', 'wall s', 'cpu s', 'MPix/s', 'peak MB', 'read MB', 'written MB'))
+    for r in results:
+        if 'error' in r:
+            print('%-16s failed (%s)' % (r['stage'], r['error']))
+            continue
+        print('%-16s %9.3f %9.3f %9s %10s %11s %11s' % (r['stage'], r['seconds'], r['cpu_seconds'],
+                                                         '' if r['mpix_per_s'] is None else r['mpix_per_s'],
+                                                         _mb(r['peak_rss_bytes']), _mb(r['bytes_read']),
+                                                         _mb(r['bytes_written'])))
+
+
+#wall time of each stage relative to an earlier results file (> 1 means slower now)
+def print_comparison(results, old_path):
+    f = open(old_path, 'r')
+    old = dict((r['stage'], r) for r in json.load(f)['stages'] if 'error' not in r)
+    f.close()
+    print('\nChange against', old_path)
+    for r in results:
+        before = old.get(r['stage'])
+        if before is None or 'error' in r or not before['seconds']:
+            continue
+        ratio = r['seconds'] / before['seconds']
+        print('%-16s %6.2fx %s' % (r['stage'], ratio, 'slower' if ratio > 1 else 'faster'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the processing stages on synthetic scenes')
+    parser.add_argument('--size', type=int, default=2048, help='scene width and height in pixels')
+    parser.add_argument('--scenes', type=int, default=1, help='scenes per Landsat sensor and Sentinel-2 zips')
+    parser.add_argument('--dates', type=int, default=10, help='layers of the ndvi_mos_gp time series')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes used by the ingest stages')
+    parser.add_argument('--stages', default=','.join(name for name, _ in STAGES), help='comma separated stages to run')
+    parser.add_argument('--output', default='benchmark_results.json', help='results file')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    parser.add_argument('--workspace', help='scratch folder (default: a new temporary folder)')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch folder')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the stages')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure_stage(args.measure, args.workspace, os.path.join(args.workspace, 'benchmark_' + args.measure + '.json'))
+        return
+
+    stages = stage_order([s for s in args.stages.split(',') if s])
+    workspace = args.workspace or tempfile.mkdtemp(prefix='goes_benchmark_')
+    workspace = os.path.abspath(workspace).replace('\\', '/')
+    if not os.path.exists(workspace):
+        os.makedirs(workspace)
+    print('Generating synthetic data in', workspace)
+    start = time.perf_counter()
+    make_workspace(workspace, args.size, args.scenes, args.dates, args.workers)
+    print('Done in %.1f s\n' % (time.perf_counter() - start))
+
+    results = []
+    for name in stages:
+        print('Running', name)
+        results.append(run_stage(name, workspace, args.verbose))
+    print()
+    print_results(results)
+
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': _environment(),
+              'parameters': {'size': args.size, 'scenes': args.scenes, 'dates': args.dates, 'workers': args.workers},
+              'stages': results}
+    f = open(args.output, 'w')
+    json.dump(report, f, indent=1)
+    f.close()
+    print('\nResults written to', args.output)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    if not args.keep and not args.workspace:
+        shutil.rmtree(workspace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#Incremental build manifest for the native stages.  A stage's outputs count as
+#up to date only if the manifest holds, for every output, a signature of
+#  - the stage function and its arguments (output paths, calibration parameters, ...)
+#  - the size and mtime of each input file
+#  - the source code of the function's module and the helper modules it imports
+#and the output's own size and mtime still match what was recorded when it was
+#written.  A leftover file from a crashed run, changed calibration inputs or a
+#code change therefore all lead to a recompute.
+#The manifest is an append-only JSON-lines journal: an interrupted write can only
+#lose its last line, and later lines override earlier ones for the same output.
+
+import hashlib
+import json
+import os
+import sys
+import types
+
+_codeVersions = {}
+
+
+#(size, mtime) of a file, or None if it does not exist; /vsizip/ paths use the zip archive
+def file_state(path):
+    if path.startswith('/vsizip/'):
+        path = path[len('/vsizip/'):path.lower().find('.zip') + len('.zip')]
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime]
+
+
+#hash of the source of module and of the modules it imports from the same folder
+def code_version(module):
+    if module.__name__ not in _codeVersions:
+        folder = os.path.dirname(os.path.abspath(module.__file__))
+        seen = {}
+        pending = [module]
+        while pending:
+            current = pending.pop()
+            if current.__name__ in seen:
+                continue
+            f = open(current.__file__, 'rb')
+            seen[current.__name__] = hashlib.sha1(f.read()).hexdigest()
+            f.close()
+            for value in vars(current).values():
+                if isinstance(value, types.ModuleType) and getattr(value, '__file__', None) and \
+                        os.path.dirname(os.path.abspath(value.__file__)) == folder:
+                    pending.append(value)
+        _codeVersions[module.__name__] = hashlib.sha1(json.dumps(seen, sort_keys=True).encode()).hexdigest()
+    return _codeVersions[module.__name__]
+
+
+def _plain(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(repr(value) + ' cannot be part of a stage signature')
+
+
+#signature of a stage (see the module comment); computed from the current input files
+def stage_signature(stage):
+    module = sys.modules[stage.func.__module__]
+    content = [
+        stage.func.__module__ + '.' + stage.func.__name__,
+        stage.args,
+        [(path, file_state(path)) for path in stage.inputs],
+        code_version(module),
+    ]
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=_plain).encode()).hexdigest()
+
+
+class Manifest(object):
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        lines = 0
+        if os.path.exists(path):
+            f = open(path, 'r')
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry['output']] = entry
+                lines += 1
+            f.close()
+        #rewrite the journal once superseded lines make up most of it
+        if lines > 2 * len(self.entries) + 100:
+            self._compact()
+
+    def _compact(self):
+        tmpPath = self.path + '.tmp'
+        f = open(tmpPath, 'w')
+        for entry in self.entries.values():
+            f.write(json.dumps(entry) + '\n')
+        f.close()
+        os.replace(tmpPath, self.path)
+
+    #True if every output of stage exists unchanged and was built with the current signature
+    def is_current(self, stage):
+        if not stage.outputs:
+            return False
+        signature = stage_signature(stage)
+        for path in stage.outputs:
+            entry = self.entries.get(os.path.abspath(path))
+            if entry is None or entry['signature'] != signature or entry['state'] != file_state(path):
+                return False
+        return True
+
+    #True if path was recorded as a complete output of some stage and is unchanged since
+    def is_recorded(self, path):
+        entry = self.entries.get(os.path.abspath(path))
+        return entry is not None and entry['state'] == file_state(path)
+
+    #record the outputs of a stage that has just finished successfully
+    def record(self, stage):
+        signature = stage_signature(stage)
+        f = open(self.path, 'a')
+        for path in stage.outputs:
+            entry = {'output': os.path.abspath(path), 'signature': signature, 'state': file_state(path)}
+            self.entries[entry['output']] = entry
+            f.write(json.dumps(entry) + '\n')
+        f.close()
+
+    #the stages that need to run: those not current, and everything depending on a stage that runs
+    def pending(self, stages):
+        names = set()
+        result = []
+        for stage in stages:
+            if any(dep in names for dep in stage.deps) or not self.is_current(stage):
+                names.add(stage.name)
+                result.append(stage)
+        return result
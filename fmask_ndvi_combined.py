@@ -1,48 +1,38 @@
 import sys, os, fnmatch, shutil
-from pathlib import Path
 import zipfile
 import pprint
 
+import area_of_interest
+import build_manifest
+import process_runner
+import raster_io
+import scene_catalog
+import scene_scheduler
+import tool_registry
+import vegetation_indices
+
 basePath = os.path.dirname(sys.argv[0]).replace("\\", "/")
 
-def FindModelerExe():
-    if not os.path.exists(basePath + '/modeler_location.txt'):
-        f = open(basePath + '/modeler_location.txt', 'w')
-        searchdir = [] #list of possible ERDAS install locations
-        for root, dirs, files in os.walk('C:\Program Files\\'):
-            for dir in dirs:
-                if dir == 'Hexagon':
-                    searchdir.append(os.path.join(root, dir))
-                    print (os.path.join(root,dir))
-        for i in range (0, len(searchdir)):
-            for root, dirs, files in os.walk(searchdir[i]):
-                for exe in fnmatch.filter(files, '*.exe'):
-                    if exe == 'modeler.exe':
-                        modeler = os.path.join(root, exe)
-                    elif exe == 'imagecommand.exe':
-                        imagecommand = os.path.join(root, exe)
-                    elif exe == 'imgcopy.exe':
-                        imgcopy = os.path.join(root, exe)
-        modeler = '"' + modeler + '" @'
-        imagecommand = '"' + imagecommand + '" @'
-        imgcopy = '"' + imgcopy + '" @'
-
-        f.write("{}\n{}\n{}".format(modeler, imagecommand, imgcopy))
-        f.close()
-        return modeler, imagecommand, imgcopy
-    f = open(basePath + '/modeler_location.txt')
-    paths = []
-    for line in f:
-        paths.append(line.strip())
-    f.close()
-    return paths[0], paths[1], paths[2]
-
-def findFmaskExe():
-    searchdir = []
-    for root, dirs, files in os.walk(basePath):
-        for exe in fnmatch.filter(files, '*.exe'):
-            if exe == 'Fmask.exe':
-                return os.path.join(root, exe).replace("\\", "/")
+#Standalone mode: mask NDVI files that already exist with their Fmask rasters.
+#Process_landsat8 masks NDVI while computing it for scenes whose Fmask raster is in
+#FMask_data, so this is only needed for NDVI produced before Fmask was run.
+MASK_EXISTING_NDVI = True
+
+#Format of the masked NDVI: 'HFA' writes ERDAS .img files, 'COG' compressed
+#Cloud-Optimized GeoTIFFs (.tif) with overviews
+OUTPUT_FORMAT = 'HFA'
+
+#Area of interest: None processes the whole NDVI rasters.  A (west, south, east, north) box in
+#degrees of longitude/latitude, or the path of a GeoJSON polygon file (relative to the
+#workspace), restricts the masked NDVI to the pixels covering it (see area_of_interest.py)
+AOI = None
+
+#Number of Fmask / imgcopy processes run side by side, and how often a failed one is retried
+WORKERS = os.cpu_count()
+RETRIES = 1
+#Per-process time limit in seconds (None for no limit)
+FMASK_TIMEOUT = 3600
+IMGCOPY_TIMEOUT = 600
 
 def CheckOutputDir():
     if not os.path.exists(basePath + '/external_files/'):
@@ -52,72 +42,56 @@ def CheckOutputDir():
     if not os.path.exists(basePath + '/NDVI/ndvi_masked'):
         os.makedirs(basePath + '/NDVI/ndvi_masked')
 
-def getImageList():
-    return [f.path for f in os.scandir(basePath + '/Raw_data/') if f.is_dir()]
-
-
-def copyFMask(dirs, fmaskPath):
-    exePaths = []
-    for i in dirs:
-        temp_path = i + '/Fmask.exe'
-        if not Path(temp_path).is_file():
-            shutil.copy2(fmaskPath, i)
-        exePaths.append(temp_path)
-    return exePaths
+def getImageList(catalog):
+    return catalog.list_dirs(basePath + '/Raw_data')
 
 
-def move_other_files(images):
+def move_other_files(catalog, images):
     for image in images:
         imagename = image[image.rfind("/") + 1:]
-        for root, dirs, files in os.walk(image):
-            if 'LC08' in image:
-                for aux in fnmatch.filter(files, "*.aux"):
-                    auxpath = os.path.join(root, aux).replace("\\", "/")
-                    os.rename(auxpath, basePath + '/external_files/' + aux)
-            for file in files:
-                if 'ndvi' in file or 'parameter' in file or 'wdri' in file or 'README' in file or 'GCP' in file:
-                    filepath = os.path.join(root, file).replace("\\", "/")
-                    os.rename(filepath, basePath + '/external_files/' + file)
-
-
-def move_fmask_files(images):
-    for image in images:
-        imagename = image[image.rfind("/") + 1:]
-        for root, dirs, files in os.walk(image):
-            for file in files:
-                if 'mask' in file:
-                    filepath = os.path.join(root, file).replace("\\", "/")
-                    try:
-                        os.rename(filepath, basePath + '/FMask_data/' + file)
-                    except:
-                        pass
-
-def find_hdr_files():
-    file_hdr = []
+        for filepath in catalog.list_files(image, recursive=True):
+            file = os.path.basename(filepath)
+            if 'LC08' in image and fnmatch.fnmatch(file, "*.aux"):
+                os.rename(filepath, basePath + '/external_files/' + file)
+            elif 'ndvi' in file or 'parameter' in file or 'wdri' in file or 'README' in file or 'GCP' in file:
+                os.rename(filepath, basePath + '/external_files/' + file)
 
-    for root, dirs, files in os.walk(basePath + '/FMask_data'):
-        for file in fnmatch.filter(files, '*.hdr'):
-            file_hdr.append(os.path.join(root, file).replace("\\", "/"))
 
-    return file_hdr
-
-def get_ndvi_fmask_files():
+def move_fmask_files(catalog, images):
+    for image in images:
+        imagename = image[image.rfind("/") + 1:]
+        for filepath in catalog.list_files(image, '*mask*', recursive=True):
+            try:
+                os.rename(filepath, basePath + '/FMask_data/' + os.path.basename(filepath))
+            except:
+                pass
+
+def find_hdr_files(catalog):
+    return catalog.list_files(basePath + '/FMask_data', '*.hdr', recursive=True)
+
+#True if the .img of an ENVI Fmask raster was written after its .hdr and data file.
+#Converting it again would change the .img and so re-mask the scene here and redo
+#Process_landsat8's stages that read it.
+def is_converted(hdr):
+    img = build_manifest.file_state(hdr.replace('.hdr', '.img'))
+    states = [build_manifest.file_state(path) for path in [hdr, hdr[:-len('.hdr')]]]
+    return img is not None and img[1] >= max(state[1] for state in states if state)
+
+def get_ndvi_fmask_files(catalog):
     ndvi_files = []
     fmask_files = []
     ndvi_names = []
     fmask_names = []
 
-    for root, dirs, files in os.walk(basePath + '/NDVI/'):
-        for img in fnmatch.filter(files, "*.img"):
-            ndvi_files.append(os.path.join(root, img).replace("\\", "/"))
-            ndvi_names.append(img[:img.rfind('_')])
-        break
+    for path in catalog.list_files(basePath + '/NDVI', "*.img") + catalog.list_files(basePath + '/NDVI', "*.tif"):
+        img = os.path.basename(path)
+        ndvi_files.append(path)
+        ndvi_names.append(img[:img.rfind('_')])
 
-    for root, dirs, files in os.walk(basePath + '/FMask_data/'):
-        for img in fnmatch.filter(files, "*.img"):
-            fmask_files.append(os.path.join(root, img).replace("\\", "/"))
-            fmask_names.append(img[:img.rfind('_')].upper())
-        break
+    for path in catalog.list_files(basePath + '/FMask_data', "*.img"):
+        img = os.path.basename(path)
+        fmask_files.append(path)
+        fmask_names.append(img[:img.rfind('_')].upper())
 
     common_files = []
 
@@ -130,108 +104,105 @@ def get_ndvi_fmask_files():
     return common_files
 
 
-def generate_batchlist(files, modeler):
+#True if the masked NDVI of stage was written by Process_landsat8's fused stage (whose
+#signature differs from stage's) after both the NDVI and the Fmask raster were last
+#written.  Re-masking it would only make the next Landsat run redo the fused stage.
+def fused_current(manifest, stage):
+    outPath = stage.outputs[0]
+    if not manifest.is_recorded(outPath):
+        return False
+    states = [build_manifest.file_state(path) for path in stage.inputs]
+    return None not in states and build_manifest.file_state(outPath)[1] >= max(state[1] for state in states)
+
+
+def mask_ndvi_files(files):
 
-    batchList = []
+    processed = 0
+    manifest = build_manifest.Manifest(basePath + '/manifest.jsonl')
+    aoi = area_of_interest.load(AOI, basePath)
 
     for ndvi, fmask, name in files:
-        if not os.path.exists(basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked.img'):
-            f = open(basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked_paramA', 'w')
-            f.write('SET CELLSIZE MIN;\n'\
-                    'SET WINDOW INTERSECTION;\n'\
-                    'SET AOI NONE;\n')
-            f.write('Float RASTER n1_{}_ndvi FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE "{}";\n'.format(name, ndvi))
-            f.write('Integer RASTER n2_{}_mtlfmask FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE "{}";\n'.format(name, fmask))
-            f.write('Float RASTER n4_{}_ndvi_masked FILE NEW PUBOUT USEALL ATHEMATIC FLOAT SINGLE "{}";\n'.format(name, basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked.img'))
-            f.write('n4_{}_ndvi_masked = EITHER $n1_{}_ndvi IF ( $n2_{}_mtlfmask == 0 ) OR 0 OTHERWISE ;\nQUIT;'.format(name, name, name))
-            f.close()
-            f = open(basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked_paramB', 'w')
-            f.write('5\n'\
-                'modeler\n'\
-                '-nq\n'\
-                + basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked_paramA\n'\
-                '-meter\n'\
-                '-state\n')
-            f.close()
-            batchList.append(modeler + basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked_paramB')
-    return batchList
-
-def getBatchFile(batchlist):
-    f = open(basePath + '/NDVI/ndvi_masked/' + '/batch_process.bat', 'w')
-    for i in range (0, len(batchlist)):
-        f.write(str(batchlist[i]).replace('\\', '/') + '\n')
-    f.close()
-
-
-def RunBatch():
-    try:
-        os.chdir(basePath + '/NDVI/ndvi_masked/')
-        os.system('batch_process.bat')
-    except WindowsError:
-        print('error')
+        if aoi and not raster_io.pixel_count(ndvi, aoi):
+            print(name, 'skipped: outside the area of interest')
+            continue
+        outPath = basePath + '/NDVI/ndvi_masked/' + name + '_ndvi_masked' + raster_io.FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+        stage = scene_scheduler.Stage(name + ':ndvi_masked', vegetation_indices.mask_scene, (ndvi, fmask, outPath, aoi),
+                                      inputs=[ndvi, fmask], outputs=[outPath])
+        if not manifest.is_current(stage) and not fused_current(manifest, stage):
+            print('Masking', name)
+            stage.func(*stage.args)
+            manifest.record(stage)
+            processed += 1
+    return processed
 
 
 def main():
-    FMask_path = findFmaskExe()
+    catalog = scene_catalog.SceneCatalog(basePath)
+    catalog.refresh()
+    tools = tool_registry.ToolRegistry(basePath)
+
+    FMask_path = tools.find('fmask')
     if not FMask_path:
         print("FMask Executable not found! Please copy it to the directory.")
     else:
         CheckOutputDir()
+        catalog.refresh()
 
-        list_of_images = getImageList()
-
-        subDirFmaskPath = copyFMask(list_of_images, FMask_path)
+        list_of_images = getImageList(catalog)
 
-        move_other_files(list_of_images)
+        move_other_files(catalog, list_of_images)
 
-        for i in list_of_images:
-            os.chdir(i)
-            print("Running Fmask for", os.path.basename(i))
-            print()
-            os.system('Fmask.exe')
-            print()
+        #Fmask looks for the scene in its working directory; scenes whose Fmask output is
+        #already in FMask_data are not run again
+        jobs = [process_runner.Job(os.path.basename(i), [FMask_path], cwd=i, timeout=FMASK_TIMEOUT, retries=RETRIES)
+                for i in list_of_images
+                if not catalog.list_files(basePath + '/FMask_data', os.path.basename(i) + '*mask*.hdr')]
+        print("Running Fmask for", len(jobs), "scenes on", WORKERS, "workers\n")
+        results = process_runner.run_jobs(jobs, WORKERS, process_runner.print_result)
+        process_runner.write_log(results, basePath + '/external_jobs.jsonl')
+        print()
 
-        for i in subDirFmaskPath:
-            os.remove(i)
-        move_fmask_files(list_of_images)
+        catalog.refresh()
+        move_fmask_files(catalog, list_of_images)
+        catalog.refresh()
 
-    hdr_files = find_hdr_files()
+    hdr_files = [file for file in find_hdr_files(catalog) if not is_converted(file)]
     print('\nConverting hdr files to img\n')
 
-    print ('Searching for ERDAS.exe file location')
-    ModelerLocation, ImageCommandLocation, ImgCopyLocation = FindModelerExe()
-    print ('Done Searching\n')
+    ImgCopyLocation = tools.find('imgcopy')
+    if hdr_files and not ImgCopyLocation:
+        print('imgcopy.exe not found! Set its path in tools.json or GOES_IMGCOPY.')
+        hdr_files = []
 
     print('\nFiles to be converted:')
-    for file in hdr_files:
-        print(os.path.basename(file), end=" - ")
-        try:
-            command = "{} -w 'Importing ENVI/AISA Hyperspectral Data' -t 'IMAGINE Image' -g FALSE -p FALSE -s 1 '{}' '{}'".format(ImgCopyLocation[:-2], file, file.replace('.hdr', '.img'))
-            os.system(command)
-            print("Success!")
-        except:
-            print("Failed!")
-
-
-    file_details = get_ndvi_fmask_files()
+    jobs = [process_runner.Job(os.path.basename(file),
+                               [ImgCopyLocation, '-w', 'Importing ENVI/AISA Hyperspectral Data', '-t', 'IMAGINE Image',
+                                '-g', 'FALSE', '-p', 'FALSE', '-s', '1', file, file.replace('.hdr', '.img')],
+                               timeout=IMGCOPY_TIMEOUT, retries=RETRIES)
+            for file in hdr_files]
+    results = process_runner.run_jobs(jobs, WORKERS, process_runner.print_result)
+    process_runner.write_log(results, basePath + '/external_jobs.jsonl')
+    failed = [r['name'] for r in results if not r['ok']]
+    if failed:
+        print(len(failed), 'of', len(results), 'conversions failed, see external_jobs.jsonl')
+
+    if not MASK_EXISTING_NDVI:
+        catalog.close()
+        return
+
+    catalog.refresh()
+    file_details = get_ndvi_fmask_files(catalog)
     if len(file_details) != 0:
         print('Files to be processed:')
         pprint.pprint([i[2] for i in file_details])
         print()
 
-        print('Generating batchlist for processing')
-        batchList = generate_batchlist(file_details, ModelerLocation)
-
-        if len(batchList) == 0:
+        if mask_ndvi_files(file_details) == 0:
             print('\nFiles have already been processed!')
-        else:
-            print('\nCreating Batch File')
-            getBatchFile(batchList)
-
-            print ('Running batch file in ERDAS modeler...')
-            RunBatch()
     else:
         print('No valid files found for processing')
+    catalog.refresh()
+    catalog.close()
 
 if __name__ == "__main__":
     main()
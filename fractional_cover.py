@@ -0,0 +1,216 @@
+#Native fractional cover (fC) model for NDVI mosaics, replacing the ERDAS model that
+#vi_to_fc used to generate.  The mosaic is read twice, block by block:
+#  pass 1 gathers MIN, MAX and SD of the NDVI, a fixed-bin NDVI histogram and the set
+#         of NDVI*100 integer values present, from which the MIN/MAX of the unscaled
+#         fC follow exactly.  The blocks are split between worker threads, each
+#         reading its own blocks, and the partial statistics are merged.
+#  pass 2 writes the unscaled, float-scaled and integer-scaled fC rasters together
+#The soil/vegetation endmembers follow from the pass 1 statistics by one of ENDMEMBER_RULES.
+#Given an area of interest (aoi), both passes only read the part of the mosaic covering
+#it, so the endmembers are those of the AOI, and the fC rasters only cover that part.
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+
+import numpy as np
+import rasterio
+
+import raster_io
+
+#Endmember rules:
+#  sd          soil = MIN + SD_FACTOR * SD, vegetation = MAX - SD_FACTOR * SD (the ERDAS model)
+#  robust_sd   the same with MIN/MAX taken as the ROBUST_RANGE percentiles, so a few
+#              outlier pixels do not move the endmembers
+#  percentile  soil and vegetation are the ENDMEMBER_PERCENTILES of the NDVI
+ENDMEMBER_RULES = ('sd', 'robust_sd', 'percentile')
+SD_FACTOR = 1.5
+ROBUST_RANGE = (1, 99)
+ENDMEMBER_PERCENTILES = (5, 95)
+
+#NDVI histogram: HISTOGRAM_BINS fixed bins over HISTOGRAM_RANGE (0.0001 wide); values
+#outside the range are counted in the first/last bin
+HISTOGRAM_RANGE = (-1.0, 1.0)
+HISTOGRAM_BINS = 20000
+
+#Threads reading the mosaic in pass 1
+WORKERS = os.cpu_count() or 1
+
+#Rescaled fC range (n29_Integer, n30_Integer in the ERDAS model)
+SCALED_MIN = 0
+SCALED_MAX = 100
+
+
+#colour table running from tan (bare soil) to dark green (full cover)
+def colour_ramp(entries):
+    start = np.array([210.0, 180.0, 140.0])
+    end = np.array([0.0, 100.0, 0.0])
+    ramp = {}
+    for i in range(entries):
+        rgb = start + (end - start) * i / (entries - 1)
+        ramp[i] = tuple(int(round(c)) for c in rgb) + (255,)
+    return ramp
+
+
+#valid pixels of a block as float64 real values (scaled int16 mosaics are decoded),
+#plus the number of nodata/NaN pixels
+def _valid_pixels(src, window):
+    values = raster_io.read_values(src, window).ravel()
+    invalid = np.isnan(values)
+    return values[~invalid], int(invalid.sum())
+
+
+def _empty_statistics():
+    return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'min': math.inf, 'max': -math.inf, 'values': set(),
+            'histogram': np.zeros(HISTOGRAM_BINS, dtype=np.int64)}
+
+
+#merge the statistics b into a (in place): count/mean/M2 as in Chan et al.
+def _merge_statistics(a, b):
+    total = a['count'] + b['count']
+    if b['count']:
+        delta = b['mean'] - a['mean']
+        a['mean'] += delta * b['count'] / total
+        a['m2'] += b['m2'] + delta * delta * a['count'] * b['count'] / total
+        a['count'] = total
+    a['min'] = min(a['min'], b['min'])
+    a['max'] = max(a['max'], b['max'])
+    a['values'] |= b['values']
+    a['histogram'] += b['histogram']
+    return a
+
+
+#statistics of the valid values of one block
+def _block_statistics(values, invalid):
+    stats = _empty_statistics()
+    if invalid:
+        #nodata pixels come out of pass 2 as fC 0, like NDVI 0
+        stats['values'].add(0)
+    if values.size == 0:
+        return stats
+    stats['count'] = values.size
+    stats['mean'] = values.mean()
+    stats['m2'] = ((values - stats['mean']) ** 2).sum()
+    stats['min'] = values.min()
+    stats['max'] = values.max()
+    scaled = np.trunc(values * 100).astype(np.int64)
+    first = scaled.min()
+    stats['values'].update((np.nonzero(np.bincount(scaled - first))[0] + first).tolist())
+    low, high = HISTOGRAM_RANGE
+    bins = np.clip(((values - low) * (HISTOGRAM_BINS / (high - low))).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    stats['histogram'] += np.bincount(bins, minlength=HISTOGRAM_BINS)
+    return stats
+
+
+#statistics of the given blocks of the mosaic at path, read through a dataset of their own
+def _blocks_statistics(path, windows):
+    stats = _empty_statistics()
+    with rasterio.open(path) as src:
+        for window in windows:
+            _merge_statistics(stats, _block_statistics(*_valid_pixels(src, window)))
+    return stats
+
+
+#pass 1: global statistics of the NDVI mosaic at path, gathered by workers threads (WORKERS by default)
+def mosaic_statistics(path, workers=None, aoi=None):
+    workers = workers or WORKERS
+    with rasterio.open(path) as src:
+        area = raster_io.aoi_window(src, aoi)
+        if area is None:
+            raise ValueError(path + ' does not overlap the area of interest')
+        #the workers' blocks share the block memory budget
+        windows = list(raster_io.block_windows([src], 4, raster_io.BLOCK_MEMORY // max(1, workers), area))
+    workers = max(1, min(workers, len(windows)))
+    if workers == 1:
+        stats = _blocks_statistics(path, windows)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_blocks_statistics, [path] * workers, [windows[i::workers] for i in range(workers)])
+            stats = reduce(_merge_statistics, parts, _empty_statistics())
+    if stats['count'] == 0:
+        raise ValueError(path + ' contains no valid pixels')
+    return {'min': stats['min'], 'max': stats['max'], 'sd': math.sqrt(stats['m2'] / stats['count']),
+            'count': stats['count'], 'values': sorted(stats['values']), 'histogram': stats['histogram']}
+
+
+#NDVI at the given percentile (0-100) of the histogram of stats, interpolated within its bin
+def histogram_percentile(stats, percentile):
+    histogram = stats['histogram']
+    low, high = HISTOGRAM_RANGE
+    width = (high - low) / HISTOGRAM_BINS
+    target = percentile / 100.0 * histogram.sum()
+    cumulative = np.cumsum(histogram)
+    i = min(int(np.searchsorted(cumulative, target)), HISTOGRAM_BINS - 1)
+    below = cumulative[i - 1] if i > 0 else 0
+    fraction = (target - below) / histogram[i] if histogram[i] else 0.0
+    return min(max(low + (i + fraction) * width, stats['min']), stats['max'])
+
+
+#soil and vegetation endmembers (x100, as n25_Output and n26_Output) by one of ENDMEMBER_RULES
+def endmembers(stats, rule='sd'):
+    if rule not in ENDMEMBER_RULES:
+        raise ValueError('unknown endmember rule ' + repr(rule) + ', expected one of ' + ', '.join(ENDMEMBER_RULES))
+    if rule == 'percentile':
+        return histogram_percentile(stats, ENDMEMBER_PERCENTILES[0]) * 100, \
+            histogram_percentile(stats, ENDMEMBER_PERCENTILES[1]) * 100
+    low, high = stats['min'], stats['max']
+    if rule == 'robust_sd':
+        low, high = histogram_percentile(stats, ROBUST_RANGE[0]), histogram_percentile(stats, ROBUST_RANGE[1])
+    soil = (SD_FACTOR * stats['sd'] + low) * 100
+    veg = (high - SD_FACTOR * stats['sd']) * 100
+    return soil, veg
+
+
+#unscaled fC from integer NDVI*100 values: 0 where NDVI is 0, 1 at or below the soil
+#endmember, otherwise the linear position between the endmembers in percent
+def unscaled_fc(ndvi100, soil, veg):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fc = np.where(ndvi100 - soil < 1.0, 1.0, (ndvi100 - soil) / (veg - soil) * 100)
+    fc[ndvi100 == 0] = 0
+    return np.clip(np.nan_to_num(np.trunc(fc)), 0, 255).astype(np.uint8)
+
+
+#pass 2: write the three fC rasters for the mosaic at path using pass 1 statistics
+def write_fc(path, stats, unscaled_path, scaled_fltp_path, scaled_int_path, rule='sd', aoi=None):
+    soil, veg = endmembers(stats, rule)
+    #MIN/MAX of the unscaled fC, from the NDVI*100 values present in the mosaic
+    fcValues = unscaled_fc(np.array(stats['values'], dtype=np.float64), soil, veg)
+    fcMin, fcMax = int(fcValues.min()), int(fcValues.max())
+
+    with rasterio.open(path) as src:
+        grid = raster_io.clip_grid(src, aoi)
+        unscaled = raster_io.create_like(unscaled_path, grid, 1, 'uint8')
+        scaledFltp = raster_io.create_like(scaled_fltp_path, grid, 1, 'float32')
+        scaledInt = raster_io.create_like(scaled_int_path, grid, 1, 'uint8')
+        try:
+            unscaled.write_colormap(1, colour_ramp(255))
+            unscaled.update_tags(1, LAYER_TYPE='thematic')
+            scaledInt.write_colormap(1, colour_ramp(100))
+            scaledInt.update_tags(1, LAYER_TYPE='thematic')
+
+            for window in raster_io.block_windows([unscaled, src, scaledFltp, scaledInt], 6):
+                values = raster_io.read_values(src, window, unscaled)
+                values[np.isnan(values)] = 0
+                fc = unscaled_fc(np.trunc(values * 100), soil, veg)
+                if fcMax > fcMin:
+                    scaled = (fc - fcMin) * float(SCALED_MAX - SCALED_MIN) / (fcMax - fcMin) + SCALED_MIN
+                else:
+                    scaled = np.zeros(fc.shape)
+                unscaled.write(fc, 1, window=window)
+                scaledFltp.write(scaled.astype(np.float32), 1, window=window)
+                scaledInt.write(np.trunc(scaled).astype(np.uint8), 1, window=window)
+        finally:
+            unscaled.close()
+            scaledFltp.close()
+            scaledInt.close()
+
+    for outPath in [unscaled_path, scaled_fltp_path, scaled_int_path]:
+        raster_io.commit_output(outPath)
+
+
+#both passes for one mosaic; returns the pass 1 statistics
+def fc_mosaic(path, unscaled_path, scaled_fltp_path, scaled_int_path, rule='sd', aoi=None):
+    stats = mosaic_statistics(path, aoi=aoi)
+    write_fc(path, stats, unscaled_path, scaled_fltp_path, scaled_int_path, rule, aoi)
+    return stats
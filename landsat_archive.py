@@ -0,0 +1,81 @@
+#Selective extraction of Landsat .tar / .tar.gz deliveries.  Only the members the
+#processing needs (the selected band files, the MTL metadata and the QA band) are
+#unpacked, each to a temporary name that is renamed once complete.  A marker file
+#in the scene folder records the archive's size/mtime and the size of every member
+#extracted, so an archive that has already been extracted is recognised without
+#opening (and decompressing) it again.
+
+import json
+import os
+import tarfile
+
+#Metadata and QA members extracted along with the band files
+EXTRA_SUFFIXES = ('_MTL.TXT', '_BQA.TIF', '_QA_PIXEL.TIF', '_QA_RADSAT.TIF')
+
+MARKER = '.extracted'
+
+
+#file name suffixes (upper case) of the members to extract for the given band numbers;
+#None means every member
+def member_suffixes(bands):
+    if bands is None:
+        return None
+    return tuple('_B' + str(b) + '.TIF' for b in bands) + EXTRA_SUFFIXES
+
+
+def _wanted(name, suffixes):
+    return suffixes is None or os.path.basename(name).upper().endswith(suffixes)
+
+
+def _state(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime]
+
+
+#True if out_dir holds a complete extraction of archive with the same member selection
+def is_extracted(archive, out_dir, suffixes):
+    try:
+        f = open(os.path.join(out_dir, MARKER), 'r')
+        marker = json.load(f)
+        f.close()
+    except (IOError, ValueError):
+        return False
+    if marker['archive'] != _state(archive) or marker['suffixes'] != (list(suffixes) if suffixes else None):
+        return False
+    for name, size in marker['members'].items():
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            return False
+    return True
+
+
+#extract the wanted members of archive into out_dir (flattened to their file names);
+#members already there with the right size are left alone
+def extract_archive(archive, out_dir, suffixes):
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    members = {}
+    tar = tarfile.open(archive, 'r:*')
+    for member in tar:
+        if not member.isfile() or not _wanted(member.name, suffixes):
+            continue
+        name = os.path.basename(member.name)
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != member.size:
+            src = tar.extractfile(member)
+            dst = open(path + '.partial', 'wb')
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+            dst.close()
+            src.close()
+            os.replace(path + '.partial', path)
+        members[name] = member.size
+    tar.close()
+
+    f = open(os.path.join(out_dir, MARKER), 'w')
+    json.dump({'archive': _state(archive), 'suffixes': list(suffixes) if suffixes else None, 'members': members}, f)
+    f.close()
+    return len(members)
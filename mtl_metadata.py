@@ -0,0 +1,83 @@
+#Landsat _MTL.txt metadata reader.  Each file is tokenized once into a flat
+#per-scene record {FIELD: value} with numbers converted to int/float and quoted
+#strings unquoted; GROUP / END_GROUP lines are dropped.  Records are cached on
+#disk in a JSON file keyed by the MTL path and checked against its mtime and size,
+#so re-planning a large archive reads only new or changed metadata files.
+
+import json
+import os
+
+
+def _typed(value):
+    if value.startswith('"'):
+        return value.strip('"')
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+#parse one MTL file into a record; the first occurrence of a field wins
+def parse_mtl(path):
+    record = {}
+    f = open(path, 'r')
+    for line in f:
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if not sep or key in ('GROUP', 'END_GROUP'):
+            continue
+        if key not in record:
+            record[key] = _typed(value.strip())
+    f.close()
+    return record
+
+
+def load_cache(cache_path):
+    try:
+        f = open(cache_path, 'r')
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return {}
+
+
+#write the cache to a temporary file first so an interrupted run cannot corrupt it
+def save_cache(cache, cache_path):
+    tmpPath = cache_path + '.tmp'
+    f = open(tmpPath, 'w')
+    json.dump(cache, f)
+    f.close()
+    os.replace(tmpPath, cache_path)
+
+
+#records for a list of MTL paths (None where the file cannot be read), served from
+#the cache at cache_path when the file's mtime and size are unchanged.  If counters
+#is given, its 'cache_hits' and 'cache_misses' entries are incremented.
+def read_records(paths, cache_path, counters=None):
+    cache = load_cache(cache_path)
+    changed = False
+    records = []
+    for path in paths:
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            records.append(None)
+            continue
+        entry = cache.get(key)
+        if entry is None or entry['mtime'] != st.st_mtime or entry['size'] != st.st_size:
+            entry = {'mtime': st.st_mtime, 'size': st.st_size, 'record': parse_mtl(path)}
+            cache[key] = entry
+            changed = True
+            if counters is not None:
+                counters['cache_misses'] += 1
+        elif counters is not None:
+            counters['cache_hits'] += 1
+        records.append(entry['record'])
+    if changed:
+        save_cache(cache, cache_path)
+    return records
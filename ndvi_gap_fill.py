@@ -0,0 +1,121 @@
+import sys, os, pprint
+
+import numpy as np
+
+import area_of_interest
+import build_manifest
+import raster_io
+import run_report
+import scene_catalog
+import scene_scheduler
+import temporal_stats
+
+basePath = os.path.dirname(sys.argv[0]).replace("\\", "/")
+
+#Format of the gap-filled layers: 'HFA' writes ERDAS .img files, 'COG' compressed
+#Cloud-Optimized GeoTIFFs (.tif) with overviews
+OUTPUT_FORMAT = 'HFA'
+
+#Area of interest: None processes the whole mosaics.  A (west, south, east, north) box in
+#degrees of longitude/latitude, or the path of a GeoJSON polygon file (relative to the
+#workspace), restricts the gap-filled layers to the pixels covering it (see area_of_interest.py)
+AOI = None
+
+#Memory budget (MB) for the blocks of the gap-fill stage
+MEMORY_BUDGET_MB = 4096
+
+#The timing of the gap-fill stage is written to gap_fill_Report_stages.json/.csv in the
+#workspace; set WRITE_TRACE to True to also write the gap_fill_Report_trace.json timeline
+WRITE_TRACE = False
+
+def CheckOutputDir():
+    if not os.path.exists(basePath + '/NDVI/ndvi_mos_gp'):
+        os.makedirs(basePath + '/NDVI/ndvi_mos_gp')
+
+#date of a mosaic from the start of its name: YYYY_MM_DD, YYYYMMDD, YYYY_MM (the
+#middle of the month) or YYYY (the middle of the year); None if there is none
+def get_date(name):
+    parts = name.split('_')
+    digits = ''
+    for part in parts:
+        if not part.isdigit() or len(digits + part) > 8:
+            break
+        digits += part
+    if len(digits) == 8:
+        date = digits[:4] + '-' + digits[4:6] + '-' + digits[6:]
+    elif len(digits) == 6:
+        date = digits[:4] + '-' + digits[4:6] + '-15'
+    elif len(digits) == 4:
+        date = digits + '-07-02'
+    else:
+        return None
+    try:
+        return np.datetime64(date, 'D')
+    except ValueError:
+        return None
+
+#NDVI mosaics with a date in their name, in date order: [(path, name, date)]
+def get_ndvi_mosaic_files():
+    ndvi_mosaic_files = []
+
+    catalog = scene_catalog.SceneCatalog(basePath)
+    catalog.refresh()
+    for path in catalog.list_files(basePath + '/NDVI/ndvi_mosaic', "*.img") + \
+            catalog.list_files(basePath + '/NDVI/ndvi_mosaic', "*.tif"):
+        img = os.path.basename(path)
+        name = img[:img.find('_ndvi_mos')]
+        date = get_date(name)
+        if date is None:
+            print(img, 'skipped: no date at the start of the name')
+            continue
+        ndvi_mosaic_files.append((path, name, date))
+    catalog.close()
+
+    return sorted(ndvi_mosaic_files, key=lambda f: f[2])
+
+def generate_gap_fill(files, report=None):
+
+    ext = raster_io.FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+    layers = [path for path, name, date in files]
+    #days since the first date
+    times = [int((date - files[0][2]).astype(int)) for path, name, date in files]
+    outputs = [basePath + '/NDVI/ndvi_mos_gp/' + name + '_ndvi_mos_gp' + ext for path, name, date in files]
+
+    manifest = build_manifest.Manifest(basePath + '/manifest.jsonl')
+    report = report or run_report.RunReport()
+    aoi = area_of_interest.load(AOI, basePath)
+    raster_io.BLOCK_MEMORY = MEMORY_BUDGET_MB * 1024 ** 2
+    stage = scene_scheduler.Stage('ndvi_mos:gap_fill', temporal_stats.gap_fill, [layers, times, outputs, aoi],
+                                  inputs=layers, outputs=outputs,
+                                  pixels=len(layers) * raster_io.pixel_count(layers[0], aoi))
+    if manifest.is_current(stage):
+        report.add_up_to_date([stage], [])
+        return False
+    report.run_stage(stage)
+    manifest.record(stage)
+    return True
+
+def main():
+    print ('This script fills the masked (0) pixels of each NDVI mosaic from the mosaics of the\n\
+neighbouring dates, by linear interpolation in time or the nearest valid date\n')
+    print ('The workspace directory is: ', basePath, '\n')
+
+    CheckOutputDir()
+
+    file_details = get_ndvi_mosaic_files()
+    if len(file_details) > 1:
+        print('Files to be processed:')
+        pprint.pprint([i[1] + '_ndvi_mos (' + str(i[2]) + ')' for i in file_details])
+        print()
+        print('Gap-filling the time series...')
+        report = run_report.RunReport()
+        if generate_gap_fill(file_details, report):
+            print('Done')
+        else:
+            print('Gap-filled layers are already up to date!')
+        report.write(basePath + '/gap_fill_Report', WRITE_TRACE)
+    else:
+        print('At least two dated NDVI mosaics are needed for gap-filling')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import sys, os, pprint
+
+import area_of_interest
+import build_manifest
+import raster_io
+import run_report
+import scene_catalog
+import scene_mosaic
+import scene_scheduler
+
+basePath = os.path.dirname(sys.argv[0]).replace("\\", "/")
+
+#How overlapping scenes are combined: 'max' (maximum value composite), 'mean',
+#'latest' (most recent valid value) or 'first' (earliest valid value)
+MOSAIC_RULE = 'max'
+
+#The masked NDVI scenes (NDVI/ndvi_masked) acquired in the same period are mosaicked
+#into NDVI/ndvi_mosaic/<period>_ndvi_mos, the input of vi_to_fc.
+#PERIOD is 'month' (<YYYY_MM>), 'year' (<YYYY>) or 'all' (one mosaic of every scene)
+PERIOD = 'month'
+
+#Format of the mosaics: 'HFA' writes ERDAS .img files, 'COG' compressed
+#Cloud-Optimized GeoTIFFs (.tif) with overviews
+OUTPUT_FORMAT = 'HFA'
+
+#Area of interest: None processes the whole union of the scenes.  A (west, south, east, north) box in
+#degrees of longitude/latitude, or the path of a GeoJSON polygon file (relative to the
+#workspace), restricts the mosaics to the pixels covering it (see area_of_interest.py)
+AOI = None
+
+#Worker processes and memory budget (MB) for the mosaics built at the same time
+WORKERS = os.cpu_count()
+MEMORY_BUDGET_MB = 4096
+
+#The timings of the mosaics are written to mosaic_Report_stages.json/.csv in the workspace;
+#set WRITE_TRACE to True to also write the mosaic_Report_trace.json timeline
+WRITE_TRACE = False
+
+def CheckOutputDir():
+    if not os.path.exists(basePath + '/NDVI/ndvi_mosaic'):
+        os.makedirs(basePath + '/NDVI/ndvi_mosaic')
+
+#name of the period an acquisition date (YYYY-MM-DD) falls in
+def get_period(date):
+    if PERIOD == 'year':
+        return date[:4]
+    if PERIOD == 'month':
+        return date[:4] + '_' + date[5:7]
+    return 'all'
+
+#{period: masked NDVI files of the period, in acquisition order}
+def get_ndvi_masked_files():
+    periods = {}
+
+    catalog = scene_catalog.SceneCatalog(basePath)
+    catalog.refresh()
+    for path in catalog.list_files(basePath + '/NDVI/ndvi_masked', "*.img") + \
+            catalog.list_files(basePath + '/NDVI/ndvi_masked', "*.tif"):
+        img = os.path.basename(path)
+        sensor, pathRow, date = scene_catalog.parse_scene_id(img[:img.find('_ndvi_masked')])
+        if date is None:
+            print(img, 'skipped: no acquisition date in the scene ID')
+            continue
+        periods.setdefault(get_period(date), []).append((date, path))
+    catalog.close()
+
+    return dict((period, [path for date, path in sorted(files)]) for period, files in periods.items())
+
+def generate_mosaics(periods, report=None):
+
+    manifest = build_manifest.Manifest(basePath + '/manifest.jsonl')
+    report = report or run_report.RunReport()
+    ext = raster_io.FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+    #each worker processes its mosaic in blocks within its share of the memory budget
+    blockMemory = MEMORY_BUDGET_MB * 1024 ** 2 // WORKERS
+    aoi = area_of_interest.load(AOI, basePath)
+
+    stages = []
+    for period, paths in sorted(periods.items()):
+        try:
+            grid = raster_io.clip_grid(scene_mosaic.grid_of(paths), aoi)
+        except ValueError as e:
+            print(period, 'skipped:', e)
+            continue
+        outPath = basePath + '/NDVI/ndvi_mosaic/' + period + '_ndvi_mos' + ext
+        stages.append(scene_scheduler.Stage(period + ':mosaic', scene_mosaic.mosaic_scenes, (paths, outPath, MOSAIC_RULE, aoi),
+                                            memory=raster_io.block_memory(grid.width, grid.height,
+                                                                          scene_mosaic.VALUES_PER_PIXEL, blockMemory),
+                                            inputs=paths, outputs=[outPath], pixels=grid.width * grid.height))
+
+    #leave out the mosaics whose scenes have not changed since they were built
+    pending = manifest.pending(stages)
+    report.add_up_to_date(stages, pending)
+    if pending:
+        print('Building', len(pending), 'mosaics on', WORKERS, 'workers...')
+        scene_scheduler.run_stages(pending, WORKERS, MEMORY_BUDGET_MB * 1024 ** 2, manifest.record, report)
+    return len(pending)
+
+def main():
+    print ('This script mosaics the masked NDVI scenes of each period (' + PERIOD + ') into the NDVI mosaics\n')
+    print ('The workspace directory is: ', basePath, '\n')
+
+    CheckOutputDir()
+
+    periods = get_ndvi_masked_files()
+    if len(periods) != 0:
+        print('Mosaics (' + MOSAIC_RULE + ') to be built:')
+        pprint.pprint(dict((period + '_ndvi_mos', len(paths)) for period, paths in periods.items()))
+        print()
+
+        report = run_report.RunReport()
+        if generate_mosaics(periods, report) == 0:
+            print('\nMosaics are already up to date!')
+        report.write(basePath + '/mosaic_Report', WRITE_TRACE)
+    else:
+        print('No valid files found for processing')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#Thread-pool runner for the external executables (Fmask, imgcopy, modeler, ...).
+#Each job is started directly from an argument list (no shell and no batch file),
+#up to WORKERS at a time.  A job that exits non-zero, times out or cannot be started
+#is retried up to its retry count and then reported; the other jobs carry on.
+#The result of every job (exit status, wall time, stderr) is returned and can be
+#appended to a JSON-lines log.
+
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+#Default number of jobs run side by side
+WORKERS = os.cpu_count() or 1
+
+
+#One external process: args[0] is the executable.  cwd is the working directory,
+#timeout the limit in seconds (None for no limit) and retries how often a failed
+#run is repeated.
+class Job(object):
+    def __init__(self, name, args, cwd=None, timeout=None, retries=0):
+        self.name = name
+        self.args = [str(a) for a in args]
+        self.cwd = cwd
+        self.timeout = timeout
+        self.retries = retries
+
+
+#run a job once; returncode is None if it could not be started or timed out
+def _run_once(job):
+    start = time.time()
+    try:
+        proc = subprocess.run(job.args, cwd=job.cwd, timeout=job.timeout,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        returncode = proc.returncode
+        stderr = proc.stderr.decode('utf-8', 'replace')
+    except subprocess.TimeoutExpired:
+        returncode = None
+        stderr = 'timed out after {} s'.format(job.timeout)
+    except OSError as e:
+        returncode = None
+        stderr = str(e)
+    return returncode, time.time() - start, stderr
+
+
+def _run(job):
+    attempts = 0
+    while True:
+        attempts += 1
+        returncode, seconds, stderr = _run_once(job)
+        if returncode == 0 or attempts > job.retries:
+            break
+    return {'name': job.name, 'args': job.args, 'ok': returncode == 0, 'returncode': returncode,
+            'seconds': round(seconds, 3), 'attempts': attempts, 'stderr': stderr.strip()}
+
+
+#Run a list of jobs and return their results in the same order.  on_done, if given,
+#is called with each result as soon as its job has finished.
+def run_jobs(jobs, workers=WORKERS, on_done=None):
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = dict((pool.submit(_run, job), index) for index, job in enumerate(jobs))
+        for future in as_completed(futures):
+            result = future.result()
+            if on_done:
+                on_done(result)
+            results[futures[future]] = result
+    return results
+
+
+#append results to a JSON-lines log
+def write_log(results, path):
+    f = open(path, 'a')
+    for result in results:
+        f.write(json.dumps(result) + '\n')
+    f.close()
+
+
+def print_result(result):
+    if result['ok']:
+        print(result['name'], '- Success! ({:.1f} s)'.format(result['seconds']))
+    else:
+        print(result['name'], '- Failed! (exit status {}, {} attempt(s)) {}'.format(
+            result['returncode'], result['attempts'], result['stderr'].splitlines()[-1] if result['stderr'] else ''))
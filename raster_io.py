@@ -0,0 +1,310 @@
+#Shared raster helpers for the native (non-ERDAS) processing stages.
+#Rasters are read and written in blocks sized to a memory budget, so a whole
+#scene or mosaic never has to be held in memory at once: block_windows covers
+#the grid of the first dataset with windows aligned to the native tile/strip
+#layout of all the datasets taking part, and read_aligned reads the matching
+#window of an input on another grid.  Outputs are written under a temporary name
+#ending in '.partial' (which no product listing matches) and only moved to their
+#final name by commit_output once complete, so a crashed run never leaves a
+#half-written file behind under the name of a finished product.
+#The format of an output follows from its extension: .img is written as an ERDAS
+#IMAGINE file, as the ERDAS models did; .tif as a Cloud-Optimized GeoTIFF, i.e.
+#internally tiled, compressed with COG_COMPRESS and a predictor (floating-point for
+#float products), with embedded overviews.  A .tif product is first written as a
+#tiled, lightly compressed GeoTIFF in a local staging folder (COG_STAGING_DIR) and
+#converted when it is committed, compressing the tiles on all cores, so only the
+#finished COG is written to the product folder (often a network share).
+#A stage restricted to an area of interest (see area_of_interest.py) creates its outputs
+#on clip_grid(input, aoi) and reads its inputs through read_aligned on that grid.
+#Requires numpy and rasterio (which bundles GDAL).
+
+import collections
+import hashlib
+import math
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.features import bounds
+from rasterio.warp import transform_geom
+from rasterio.windows import Window, from_bounds, transform as window_transform
+
+#Product formats the scripts can choose from (OUTPUT_FORMAT) and their file extensions
+FORMAT_EXTENSIONS = {'HFA': '.img', 'COG': '.tif'}
+RASTER_EXTENSIONS = ('.img', '.tif')
+
+#Storage of the index products: 'float32', or 'int16' holding round(value * INDEX_SCALE)
+#with the GDAL scale 1 / INDEX_SCALE declared on the band and INDEX_NODATA where the
+#value is undefined (NaN).  Readers get the real values back through read_values.
+INDEX_STORAGES = ('float32', 'int16')
+INDEX_SCALE = 10000
+INDEX_NODATA = -32768
+
+#Compression of the COG outputs: 'DEFLATE' (readable everywhere) or 'ZSTD' (faster, GDAL >= 2.3)
+COG_COMPRESS = 'DEFLATE'
+#Tile size of the COG outputs
+COG_BLOCKSIZE = 512
+#Local folder the .tif outputs are written to before their conversion to COGs (None for
+#the system temp folder); set it to a folder on the share if local disk is short
+COG_STAGING_DIR = None
+
+#Grid of an output that is not on the grid of an input (a mosaic, or an input cut to an
+#area of interest); stands in for a template dataset in create_like
+Grid = collections.namedtuple('Grid', ['crs', 'transform', 'width', 'height'])
+
+#Memory (bytes) the blocks of one stage may take.  run_stages sets it in every worker
+#to the run's memory budget divided by the number of workers.
+BLOCK_MEMORY = 256 * 1024 ** 2
+
+
+#(rows, cols) of the blocks of a stage holding values_per_pixel float32 values per
+#pixel, within budget bytes (BLOCK_MEMORY by default).  Blocks are whole multiples of
+#the largest native block (tile or strip) of datasets, never smaller than one, and
+#span the full width (of area, if given) while that fits.
+def block_shape(datasets, values_per_pixel, budget=None, area=None):
+    width, height = (area.width, area.height) if area else (datasets[0].width, datasets[0].height)
+    rowStep = min(max(ds.block_shapes[0][0] for ds in datasets), height)
+    colStep = min(max(ds.block_shapes[0][1] for ds in datasets), width)
+    pixels = max(1, (budget or BLOCK_MEMORY) // (values_per_pixel * 4))
+    if pixels >= width * rowStep:
+        return min(height, pixels // width // rowStep * rowStep), width
+    return rowStep, min(width, max(colStep, pixels // rowStep // colStep * colStep))
+
+
+#yield the block windows covering the grid of datasets[0], or only area (a window of
+#it) if given (see block_shape)
+def block_windows(datasets, values_per_pixel, budget=None, area=None):
+    area = area or Window(0, 0, datasets[0].width, datasets[0].height)
+    rows, cols = block_shape(datasets, values_per_pixel, budget, area)
+    for row in range(0, area.height, rows):
+        for col in range(0, area.width, cols):
+            yield Window(area.col_off + col, area.row_off + row, min(cols, area.width - col), min(rows, area.height - row))
+
+
+#pixel window of grid (an open dataset or a Grid) covering the bounding box of aoi (see
+#area_of_interest.load), rounded outwards to whole pixels and computed from the header
+#only; the whole grid if aoi is None, None if aoi does not overlap the grid
+def aoi_window(grid, aoi):
+    if aoi is None:
+        return Window(0, 0, grid.width, grid.height)
+    boxes = [bounds(transform_geom(aoi['crs'], grid.crs, geometry)) for geometry in aoi['geometries']]
+    area = from_bounds(min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes),
+                       max(b[3] for b in boxes), transform=grid.transform)
+    col = max(0, int(math.floor(round(area.col_off, 6))))
+    row = max(0, int(math.floor(round(area.row_off, 6))))
+    colEnd = min(grid.width, int(math.ceil(round(area.col_off + area.width, 6))))
+    rowEnd = min(grid.height, int(math.ceil(round(area.row_off + area.height, 6))))
+    if colEnd <= col or rowEnd <= row:
+        return None
+    return Window(col, row, colEnd - col, rowEnd - row)
+
+
+#Grid of the pixels of grid covering aoi (grid itself if aoi is None); a ValueError if
+#aoi does not overlap it
+def clip_grid(grid, aoi):
+    if aoi is None:
+        return grid
+    area = aoi_window(grid, aoi)
+    if area is None:
+        raise ValueError(getattr(grid, 'name', 'raster') + ' does not overlap the area of interest')
+    return Grid(grid.crs, window_transform(area, grid.transform), area.width, area.height)
+
+
+#read window of the grid of template from src.  If src is on another grid (same
+#resolution, different extent), the window covering the same ground is read and
+#pixels outside src are filled with its nodata value (or 0); only the part of the
+#window inside src is read from the file.
+def read_aligned(src, window, template, indexes=1):
+    if src.transform == template.transform and (src.width, src.height) == (template.width, template.height):
+        return src.read(indexes, window=window)
+    srcWindow = from_bounds(*template.window_bounds(window), transform=src.transform)
+    col, row = int(round(srcWindow.col_off)), int(round(srcWindow.row_off))
+    shape = (window.height, window.width) if isinstance(indexes, int) else (len(indexes), window.height, window.width)
+    out = np.full(shape, src.nodata or 0, dtype=src.dtypes[0])
+    top, left = max(row, 0), max(col, 0)
+    bottom, right = min(row + window.height, src.height), min(col + window.width, src.width)
+    if bottom > top and right > left:
+        out[..., top - row:bottom - row, left - col:right - col] = \
+            src.read(indexes, window=Window(left, top, right - left, bottom - top))
+    return out
+
+
+#temporary name an output is written under until commit_output.  The product extension
+#is not kept, so the scripts' *.img / *.tif listings never pick up an unfinished output.
+#An .img too large for a single IMAGINE file keeps its pixels in a spill file, which
+#GDAL names after the header with the extension replaced: <product>.ige for
+#<product>.img.partial, so the committed header finds it under that name.
+#A .tif output is staged in COG_STAGING_DIR, under a name unique to its product path.
+def partial_path(path):
+    if is_cog(path):
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        return os.path.join(COG_STAGING_DIR or tempfile.gettempdir(), digest + '_' + os.path.basename(path) + '.partial')
+    return path + '.partial'
+
+
+def is_cog(path):
+    return path.lower().endswith('.tif')
+
+
+#convert the tiled GeoTIFF at src_path to a COG at dst_path; overviews are averaged
+#for float rasters and sampled (nearest) for integer ones, which are often thematic
+def _write_cog(src_path, dst_path):
+    with rasterio.open(src_path) as src:
+        isFloat = np.issubdtype(np.dtype(src.dtypes[0]), np.floating)
+    rasterio.shutil.copy(src_path, dst_path, driver='COG', COMPRESS=COG_COMPRESS, PREDICTOR='YES',
+                         BLOCKSIZE=COG_BLOCKSIZE, OVERVIEWS='AUTO', NUM_THREADS='ALL_CPUS', BIGTIFF='IF_SAFER',
+                         RESAMPLING='AVERAGE' if isFloat else 'NEAREST')
+
+
+#move a finished output (and its .aux.xml sidecar, if GDAL wrote one) to its final name;
+#a .tif output is converted from its staged copy to a COG next to the product on the way
+def commit_output(path):
+    partial = partial_path(path)
+    if is_cog(path):
+        staged, partial = partial, path + '.partial'
+        _write_cog(staged, partial)
+        os.remove(staged)
+        if os.path.exists(staged + '.aux.xml'):
+            os.remove(staged + '.aux.xml')
+    if os.path.exists(partial + '.aux.xml'):
+        os.replace(partial + '.aux.xml', path + '.aux.xml')
+    os.replace(partial, path)
+
+
+#open a new output raster on the same grid as template (an open dataset), in the
+#format given by the extension of path.  The raster is created under partial_path(path);
+#call commit_output(path) after closing it.
+def create_like(path, template, count, dtype, nodata=None):
+    profile = {
+        'driver': 'HFA',
+        'width': template.width,
+        'height': template.height,
+        'count': count,
+        'dtype': dtype,
+        'crs': template.crs,
+        'transform': template.transform,
+        'nodata': nodata,
+    }
+    if is_cog(path):
+        profile.update({'driver': 'GTiff', 'tiled': True, 'blockxsize': COG_BLOCKSIZE,
+                        'blockysize': COG_BLOCKSIZE, 'BIGTIFF': 'IF_SAFER', 'interleave': 'band',
+                        'compress': 'ZSTD', 'zstd_level': 1, 'num_threads': 'ALL_CPUS'})
+    return rasterio.open(partial_path(path), 'w', **profile)
+
+
+#open a new index raster of count bands stored as storage (see INDEX_STORAGES)
+def create_index(path, template, storage='float32', count=1):
+    if storage == 'int16':
+        dst = create_like(path, template, count, 'int16', nodata=INDEX_NODATA)
+        dst.scales = (1.0 / INDEX_SCALE,) * count
+        dst.offsets = (0.0,) * count
+        return dst
+    return create_like(path, template, count, 'float32')
+
+
+#storage (see INDEX_STORAGES) of an open index raster
+def index_storage(src):
+    return 'int16' if src.dtypes[0] == 'int16' else 'float32'
+
+
+#float32 index values in the representation of storage
+def encode_index(values, storage='float32'):
+    if storage != 'int16':
+        return values
+    with np.errstate(invalid='ignore'):
+        scaled = np.clip(np.rint(values * INDEX_SCALE), -32767, 32767)
+    return np.where(np.isnan(values), INDEX_NODATA, scaled).astype(np.int16)
+
+
+#window of band 1 of src (on the grid of template, if given) as float64 real values:
+#the band's scale and offset are applied and nodata pixels are NaN
+def read_values(src, window, template=None):
+    if template is not None:
+        values = read_aligned(src, window, template).astype(np.float64)
+    else:
+        values = src.read(1, window=window).astype(np.float64)
+    if src.nodata is not None:
+        values[values == src.nodata] = np.nan
+    scale, offset = src.scales[0], src.offsets[0]
+    if scale != 1 or offset != 0:
+        values = values * scale + offset
+    return values
+
+
+#read the same window from each single-band source into a (bands, rows, cols) array
+def read_bands(sources, window):
+    return np.stack([src.read(1, window=window) for src in sources])
+
+
+#GDAL type names of the numpy pixel types used by the band files
+GDAL_TYPES = {
+    'uint8': 'Byte', 'int8': 'Int8', 'uint16': 'UInt16', 'int16': 'Int16', 'uint32': 'UInt32',
+    'int32': 'Int32', 'float32': 'Float32', 'float64': 'Float64',
+}
+
+
+#write a VRT descriptor presenting single-band files as one multi-band raster.
+#Only the band headers are read; readers of the VRT pull pixels from the sources.
+#With an aoi, the VRT only covers the window of the bands covering it.
+def build_virtual_stack(band_paths, out_path, aoi=None):
+    bands = []
+    for path in band_paths:
+        with rasterio.open(path) as src:
+            if not bands:
+                crs = src.crs
+                area = aoi_window(src, aoi)
+                if area is None:
+                    raise ValueError(path + ' does not overlap the area of interest')
+                gridTransform, width, height = window_transform(area, src.transform), area.width, area.height
+            blockY, blockX = src.block_shapes[0]
+            bands.append((path, src.dtypes[0], src.width, src.height, blockX, blockY, src.nodata))
+
+    lines = ['<VRTDataset rasterXSize="%d" rasterYSize="%d">' % (width, height)]
+    if crs:
+        lines.append('  <SRS>%s</SRS>' % escape(crs.to_wkt()))
+    lines.append('  <GeoTransform>%s</GeoTransform>' % ', '.join(repr(v) for v in gridTransform.to_gdal()))
+    for i, (path, dtype, xSize, ySize, blockX, blockY, nodata) in enumerate(bands):
+        lines.append('  <VRTRasterBand dataType="%s" band="%d">' % (GDAL_TYPES[dtype], i + 1))
+        if nodata is not None:
+            lines.append('    <NoDataValue>%r</NoDataValue>' % nodata)
+        lines += [
+            '    <SimpleSource>',
+            '      <SourceFilename relativeToVRT="0">%s</SourceFilename>' % escape(path),
+            '      <SourceBand>1</SourceBand>',
+            '      <SourceProperties RasterXSize="%d" RasterYSize="%d" DataType="%s" BlockXSize="%d" BlockYSize="%d" />'
+            % (xSize, ySize, GDAL_TYPES[dtype], blockX, blockY),
+            '      <SrcRect xOff="%d" yOff="%d" xSize="%d" ySize="%d" />' % (area.col_off, area.row_off, width, height),
+            '      <DstRect xOff="0" yOff="0" xSize="%d" ySize="%d" />' % (width, height),
+            '    </SimpleSource>',
+            '  </VRTRasterBand>',
+        ]
+    lines.append('</VRTDataset>')
+
+    f = open(partial_path(out_path), 'w')
+    f.write('\n'.join(lines) + '\n')
+    f.close()
+    commit_output(out_path)
+
+
+#working memory in bytes of a stage holding values_per_pixel float32 values per pixel
+#of a width x height raster, processed in blocks within budget bytes
+def block_memory(width, height, values_per_pixel, budget=None):
+    return min(width * height * values_per_pixel * 4, budget or BLOCK_MEMORY)
+
+
+#number of pixels (width x height) of the raster at path, or of its part covering aoi
+#(read from the header only)
+def pixel_count(path, aoi=None):
+    width, height = aoi_size(path, aoi)
+    return width * height
+
+
+#(width, height) of the part of the raster at path covering aoi (read from the header
+#only); (0, 0) if aoi does not overlap it
+def aoi_size(path, aoi):
+    with rasterio.open(path) as src:
+        area = aoi_window(src, aoi)
+    return (area.width, area.height) if area else (0, 0)
@@ -0,0 +1,178 @@
+#Per-stage performance report of a processing run.  For every stage (and for the
+#phases the scripts run in the main process, such as ingest and metadata parsing) it
+#records, per scene: status, start time, wall and CPU time, pixels processed, bytes
+#read/written, peak memory and cache hits.  Stages the build manifest finds up to
+#date are listed as cache hits.  The report is written as <prefix>_stages.json and
+#<prefix>_stages.csv, and optionally as a Chrome trace-event timeline
+#(<prefix>_trace.json, open it in chrome://tracing or https://ui.perfetto.dev).
+#Byte counts and the per-stage memory peak come from /proc (Linux); elsewhere the
+#byte counts are left empty and the peak is the process's high-water mark.
+
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+COLUMNS = ['scene', 'stage', 'status', 'start', 'seconds', 'cpu_seconds', 'pixels', 'mpix_per_s', 'bytes_read',
+           'bytes_written', 'peak_rss_bytes', 'cache_hits', 'cache_misses', 'pid']
+
+
+def _io_counters():
+    try:
+        f = open('/proc/self/io', 'r')
+    except IOError:
+        return None, None
+    counters = {}
+    for line in f:
+        key, sep, value = line.partition(':')
+        counters[key.strip()] = int(value)
+    f.close()
+    return counters.get('rchar'), counters.get('wchar')
+
+
+#start a new memory high-water mark for this process (Linux 4.0 and later)
+def _reset_peak():
+    try:
+        f = open('/proc/self/clear_refs', 'w')
+        f.write('5')
+        f.close()
+    except (IOError, OSError):
+        pass
+
+
+def _peak_rss():
+    try:
+        f = open('/proc/self/status', 'r')
+        for line in f:
+            if line.startswith('VmHWM:'):
+                f.close()
+                return int(line.split()[1]) * 1024
+        f.close()
+    except IOError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _delta(before, after):
+    return after - before if before is not None and after is not None else None
+
+
+def _begin():
+    _reset_peak()
+    bytesRead, bytesWritten = _io_counters()
+    return bytesRead, bytesWritten, time.process_time(), time.time()
+
+
+#measurements of the work done in this process since _begin returned begin
+def _end(begin):
+    seconds = time.time() - begin[3]
+    cpu = time.process_time() - begin[2]
+    bytesRead, bytesWritten = _io_counters()
+    return {'start': begin[3], 'seconds': seconds, 'cpu_seconds': cpu, 'bytes_read': _delta(begin[0], bytesRead),
+            'bytes_written': _delta(begin[1], bytesWritten), 'peak_rss_bytes': _peak_rss(), 'pid': os.getpid()}
+
+
+#run func(*args) and return its result with the measurements of the call; meant to
+#be run in the process doing the work (a scheduler worker, or the main process)
+def measure(func, args):
+    begin = _begin()
+    result = func(*args)
+    return result, _end(begin)
+
+
+class RunReport(object):
+    def __init__(self):
+        self.rows = []
+        self.created = time.time()
+
+    #record one stage; name is 'scene:stage' as used by the scheduler
+    def add(self, name, status, metrics=None, pixels=0, cache_hits=0, cache_misses=0):
+        scene, sep, stage = name.rpartition(':')
+        row = dict((column, None) for column in COLUMNS)
+        row.update({'scene': scene, 'stage': stage, 'status': status, 'pixels': pixels,
+                    'cache_hits': cache_hits, 'cache_misses': cache_misses})
+        if metrics:
+            row.update(metrics)
+            row['start'] = round(row['start'], 6)
+            row['seconds'] = round(row['seconds'], 6)
+            row['cpu_seconds'] = round(row['cpu_seconds'], 6)
+            if pixels and row['seconds'] > 0:
+                row['mpix_per_s'] = round(pixels / row['seconds'] / 1e6, 3)
+        self.rows.append(row)
+
+    def add_stage(self, stage, status, metrics=None):
+        self.add(stage.name, status, metrics, stage.pixels)
+
+    #record the stages of a run that build_manifest left out as up to date
+    def add_up_to_date(self, stages, pending):
+        names = set(stage.name for stage in pending)
+        for stage in stages:
+            if stage.name not in names:
+                self.add(stage.name, 'up_to_date', pixels=0, cache_hits=1)
+
+    #run a stage in this process and record it; returns the stage's result
+    def run_stage(self, stage):
+        result, metrics = measure(stage.func, stage.args)
+        self.add_stage(stage, 'done', metrics)
+        return result
+
+    #measure a block of work in the main process, e.g.
+    #  with report.phase('metadata') as counters:
+    #      ...; counters['cache_hits'] = n
+    @contextmanager
+    def phase(self, name, pixels=0):
+        counters = {'cache_hits': 0, 'cache_misses': 0}
+        begin = _begin()
+        yield counters
+        self.add(name, 'done', _end(begin), pixels, counters['cache_hits'], counters['cache_misses'])
+
+    def totals(self):
+        totals = {'stages': len(self.rows), 'seconds': round(time.time() - self.created, 3)}
+        for status in ['done', 'failed', 'skipped', 'up_to_date']:
+            totals[status] = sum(1 for row in self.rows if row['status'] == status)
+        #bytes are not totalled: a phase's counters include the worker processes it waited for
+        for column in ['cpu_seconds', 'pixels', 'cache_hits', 'cache_misses']:
+            totals[column] = sum(row[column] or 0 for row in self.rows)
+        totals['cpu_seconds'] = round(totals['cpu_seconds'], 3)
+        return totals
+
+    #write <prefix>_stages.json, <prefix>_stages.csv and, if trace, <prefix>_trace.json
+    def write(self, prefix, trace=False):
+        f = open(prefix + '_stages.json', 'w')
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.created)),
+                   'totals': self.totals(), 'stages': self.rows}, f, indent=1)
+        f.close()
+
+        f = open(prefix + '_stages.csv', 'w', newline='')
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(self.rows)
+        f.close()
+
+        if trace:
+            self.write_trace(prefix + '_trace.json')
+
+    #Chrome trace-event timeline: one complete event per measured stage, one row per process
+    def write_trace(self, path):
+        events = []
+        for row in self.rows:
+            if row['start'] is None:
+                continue
+            args = dict((column, row[column]) for column in COLUMNS if column not in ('start', 'pid'))
+            events.append({'name': (row['scene'] + ':' if row['scene'] else '') + row['stage'], 'cat': row['stage'],
+                           'ph': 'X', 'ts': int((row['start'] - self.created) * 1e6),
+                           'dur': int(row['seconds'] * 1e6), 'pid': row['pid'], 'tid': row['pid'], 'args': args})
+        f = open(path, 'w')
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        f.close()
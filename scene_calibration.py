@@ -0,0 +1,157 @@
+#Per-scene calibration table of the Landsat scenes of a run.  The values the TOA
+#calibration needs (day of year, earth-sun distance, sun elevation and zenith cosine,
+#radiance rescaling gain/bias and the resulting per-band TOA scale/offset) are held
+#in one NumPy structured array with a row per scene, keyed by scene ID.  Each row is
+#built from that scene's own MTL record, and every column is computed for all the
+#scenes of a sensor at once.
+
+import numpy as np
+
+import toa_reflectance
+
+#Earth-sun distance (AU) by day of year, EARTH_SUN_DISTANCE[doy - 1]
+EARTH_SUN_DISTANCE = np.array([
+    0.98331, 0.98330, 0.98330, 0.98330, 0.98330, 0.98332, 0.98333, 0.98335, 0.98338, 0.98341,
+    0.98345, 0.98349, 0.98354, 0.98359, 0.98365, 0.98371, 0.98378, 0.98385, 0.98393, 0.98401,
+    0.98410, 0.98419, 0.98428, 0.98439, 0.98449, 0.98460, 0.98472, 0.98484, 0.98496, 0.98509,
+    0.98523, 0.98536, 0.98551, 0.98565, 0.98580, 0.98596, 0.98612, 0.98628, 0.98645, 0.98662,
+    0.98680, 0.98698, 0.98717, 0.98735, 0.98755, 0.98774, 0.98794, 0.98814, 0.98835, 0.98856,
+    0.98877, 0.98899, 0.98921, 0.98944, 0.98966, 0.98989, 0.99012, 0.99036, 0.99060, 0.99084,
+    0.99108, 0.99133, 0.99158, 0.99183, 0.99208, 0.99234, 0.99260, 0.99286, 0.99312, 0.99339,
+    0.99365, 0.99392, 0.99419, 0.99446, 0.99474, 0.99501, 0.99529, 0.99556, 0.99584, 0.99612,
+    0.99640, 0.99669, 0.99697, 0.99725, 0.99754, 0.99782, 0.99811, 0.99840, 0.99868, 0.99897,
+    0.99926, 0.99954, 0.99983, 1.00012, 1.00041, 1.00069, 1.00098, 1.00127, 1.00155, 1.00184,
+    1.00212, 1.00240, 1.00269, 1.00297, 1.00325, 1.00353, 1.00381, 1.00409, 1.00437, 1.00464,
+    1.00492, 1.00519, 1.00546, 1.00573, 1.00600, 1.00626, 1.00653, 1.00679, 1.00705, 1.00731,
+    1.00756, 1.00781, 1.00806, 1.00831, 1.00856, 1.00880, 1.00904, 1.00928, 1.00952, 1.00975,
+    1.00998, 1.01020, 1.01043, 1.01065, 1.01087, 1.01108, 1.01129, 1.01150, 1.01170, 1.01191,
+    1.01210, 1.01230, 1.01249, 1.01267, 1.01286, 1.01304, 1.01321, 1.01338, 1.01355, 1.01371,
+    1.01387, 1.01403, 1.01418, 1.01433, 1.01447, 1.01461, 1.01475, 1.01488, 1.01500, 1.01513,
+    1.01524, 1.01536, 1.01547, 1.01557, 1.01567, 1.01577, 1.01586, 1.01595, 1.01603, 1.01610,
+    1.01618, 1.01625, 1.01631, 1.01637, 1.01642, 1.01647, 1.01652, 1.01656, 1.01659, 1.01662,
+    1.01665, 1.01667, 1.01668, 1.01670, 1.01670, 1.01670, 1.01670, 1.01669, 1.01668, 1.01666,
+    1.01664, 1.01661, 1.01658, 1.01655, 1.01650, 1.01646, 1.01641, 1.01635, 1.01629, 1.01623,
+    1.01616, 1.01609, 1.01601, 1.01592, 1.01584, 1.01575, 1.01565, 1.01555, 1.01544, 1.01533,
+    1.01522, 1.01510, 1.01497, 1.01485, 1.01471, 1.01458, 1.01444, 1.01429, 1.01414, 1.01399,
+    1.01383, 1.01367, 1.01351, 1.01334, 1.01317, 1.01299, 1.01281, 1.01263, 1.01244, 1.01225,
+    1.01205, 1.01186, 1.01165, 1.01145, 1.01124, 1.01103, 1.01081, 1.01060, 1.01037, 1.01015,
+    1.00992, 1.00969, 1.00946, 1.00922, 1.00898, 1.00874, 1.00850, 1.00825, 1.00800, 1.00775,
+    1.00750, 1.00724, 1.00698, 1.00672, 1.00646, 1.00620, 1.00593, 1.00566, 1.00539, 1.00512,
+    1.00485, 1.00457, 1.00430, 1.00402, 1.00374, 1.00346, 1.00318, 1.00290, 1.00262, 1.00234,
+    1.00205, 1.00177, 1.00148, 1.00119, 1.00091, 1.00062, 1.00033, 1.00005, 0.99976, 0.99947,
+    0.99918, 0.99890, 0.99861, 0.99832, 0.99804, 0.99775, 0.99747, 0.99718, 0.99690, 0.99662,
+    0.99634, 0.99605, 0.99577, 0.99550, 0.99522, 0.99494, 0.99467, 0.99440, 0.99412, 0.99385,
+    0.99359, 0.99332, 0.99306, 0.99279, 0.99253, 0.99228, 0.99202, 0.99177, 0.99152, 0.99127,
+    0.99102, 0.99078, 0.99054, 0.99030, 0.99007, 0.98983, 0.98961, 0.98938, 0.98916, 0.98894,
+    0.98872, 0.98851, 0.98830, 0.98809, 0.98789, 0.98769, 0.98750, 0.98731, 0.98712, 0.98694,
+    0.98676, 0.98658, 0.98641, 0.98624, 0.98608, 0.98592, 0.98577, 0.98562, 0.98547, 0.98533,
+    0.98519, 0.98506, 0.98493, 0.98481, 0.98469, 0.98457, 0.98446, 0.98436, 0.98426, 0.98416,
+    0.98407, 0.98399, 0.98391, 0.98383, 0.98376, 0.98370, 0.98363, 0.98358, 0.98353, 0.98348,
+    0.98344, 0.98340, 0.98337, 0.98335, 0.98333, 0.98331])
+
+#Landsat 7 ETM+ post-calibration dynamic ranges of bands 1-5 and 7.  A band whose
+#RADIANCE_MAXIMUM is L7_HIGH_GAIN_LMAX was acquired in high gain.
+L7_HIGH_GAIN_LMAX = np.array([191.60, 196.50, 152.90, 157.40, 31.06, 10.80])
+#rows: low gain, high gain
+L7_GRESCALE = np.array([[1.180709, 1.209843, 0.942520, 0.969291, 0.191220, 0.066496],
+                        [0.778740, 0.798819, 0.621654, 0.639764, 0.126220, 0.043898]])
+L7_BRESCALE = np.array([[-7.38, -7.61, -5.94, -6.07, -1.19, -0.42],
+                        [-6.98, -7.20, -5.62, -5.74, -1.13, -0.39]])
+
+#Landsat 5 TM rescaling of bands 1-5 and 7; rows: old, new dynamic range of bands 1 and 2.
+#The old range is used for scenes acquired in L5_OLD_RANGE_YEAR (the year check of
+#the original parameter lists only ever matched 1984).
+L5_GRESCALE = np.array([[0.671339, 0.1322205, 1.043976, 0.876024, 0.120354, 0.065551],
+                        [0.765827, 1.448189, 1.043976, 0.876024, 0.120354, 0.065551]])
+L5_BRESCALE = np.array([[-2.19, -4.16, -2.21, -2.39, -0.49, -0.22],
+                        [-2.29, -4.29, -2.21, -2.39, -0.49, -0.22]])
+L5_OLD_RANGE_YEAR = 1984
+
+#Landsat 4 TM rescaling of bands 1-5 and 7; rows: old, new dynamic range of band 1.
+#The old range is used for scenes whose band 1 RADIANCE_MAXIMUM is L4_OLD_RANGE_LMAX.
+L4_GRESCALE = np.array([[0.647717, 1.334016, 1.004606, 0.876024, 0.125079, 0.065945],
+                        [0.679213, 1.334016, 1.004606, 0.876024, 0.125079, 0.065945]])
+L4_BRESCALE = np.array([[-2.17, -4.17, -2.17, -2.39, -0.50, -0.22],
+                        [-2.20, -4.17, -2.17, -2.39, -0.50, -0.22]])
+L4_OLD_RANGE_LMAX = 163
+
+DTYPE = np.dtype([
+    ('scene', 'U64'),
+    ('sensor', 'U4'),
+    ('doy', 'i2'),
+    ('esdist', 'f8'),
+    ('sun_elevation', 'f8'),
+    ('cos_zenith', 'f8'),
+    ('gain', 'f8', (6,)),
+    ('bias', 'f8', (6,)),
+    ('scale', 'f4', (6,)),
+    ('offset', 'f4', (6,)),
+])
+
+
+#day of year and year of 'YYYY-MM-DD' dates
+def day_of_year(dates):
+    days = np.array(dates, dtype='datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    return (days - years).astype(np.int64) + 1, years.astype(np.int64) + 1970
+
+
+#(n, len(fields)) array of fields from n MTL records
+def _columns(records, fields):
+    return np.array([[record[field] for field in fields] for record in records], dtype=np.float64).reshape(-1, len(fields))
+
+
+#radiance rescaling gain and bias of each scene
+def _rescaling(sensor, records, years):
+    bands = toa_reflectance.BANDS[sensor]
+    if sensor == 'LC08':
+        return _columns(records, ['RADIANCE_MULT_BAND_%d' % b for b in bands]), \
+            _columns(records, ['RADIANCE_ADD_BAND_%d' % b for b in bands])
+    if sensor == 'LE7':
+        lmax = _columns(records, ['RADIANCE_MAXIMUM_BAND_%d' % b for b in bands])
+        highGain = np.round(lmax, 2) == L7_HIGH_GAIN_LMAX
+        return np.where(highGain, L7_GRESCALE[1], L7_GRESCALE[0]), np.where(highGain, L7_BRESCALE[1], L7_BRESCALE[0])
+    if sensor == 'LT5':
+        newRange = (years != L5_OLD_RANGE_YEAR).astype(np.int64)
+        return L5_GRESCALE[newRange], L5_BRESCALE[newRange]
+    lmax = _columns(records, ['RADIANCE_MAXIMUM_BAND_1'])[:, 0]
+    newRange = (lmax.astype(np.int64) != L4_OLD_RANGE_LMAX).astype(np.int64)
+    return L4_GRESCALE[newRange], L4_BRESCALE[newRange]
+
+
+#calibration table of the scenes of one sensor from their MTL records (in the same order as names)
+def build_table(sensor, names, records):
+    table = np.zeros(len(names), dtype=DTYPE)
+    if not len(names):
+        return table
+    table['scene'] = names
+    table['sensor'] = sensor
+    doy, years = day_of_year([str(record['DATE_ACQUIRED']) for record in records])
+    table['doy'] = doy
+    table['sun_elevation'] = _columns(records, ['SUN_ELEVATION'])[:, 0]
+    table['cos_zenith'] = np.cos(np.radians(90 - table['sun_elevation']))
+    if sensor == 'LC08':
+        table['esdist'] = _columns(records, ['EARTH_SUN_DISTANCE'])[:, 0]
+    else:
+        table['esdist'] = EARTH_SUN_DISTANCE[doy - 1]
+    table['gain'], table['bias'] = _rescaling(sensor, records, years)
+    table['scale'], table['offset'] = toa_reflectance.toa_coefficients(
+        sensor, table['gain'], table['bias'], table['esdist'], table['sun_elevation'])
+    return table
+
+
+#one table of all the scenes in tables, sorted by scene ID
+def concatenate(tables):
+    table = np.concatenate([np.zeros(0, dtype=DTYPE)] + list(tables))
+    return table[np.argsort(table['scene'], kind='stable')]
+
+
+#rows of table (from concatenate) for the scene IDs in scenes, in the same order
+def lookup(table, scenes):
+    scenes = np.asarray(scenes, dtype=table.dtype['scene'])
+    positions = np.searchsorted(table['scene'], scenes)
+    found = positions < len(table)
+    found[found] = table['scene'][positions[found]] == scenes[found]
+    if not found.all():
+        raise KeyError('no calibration for ' + ', '.join(scenes[~found]))
+    return table[positions]
@@ -0,0 +1,206 @@
+#SQLite catalog of the workspace, kept in <workspace>/scene_catalog.sqlite.
+#It replaces the repeated os.walk calls of the processing scripts:
+#  dirs / files  listing of every folder and file under the workspace.  refresh() only
+#                lists folders whose mtime changed since the last scan; for the others
+#                the stored listing is used, so a rescan costs one stat per folder.
+#  scenes        scene ID, sensor, path/row (or tile), acquisition date, source (scene
+#                folder or zip), raster size and the source mtime the entry was built from
+#                (the latest of the source and its band files, stat'ed directly)
+#  bands         band name -> band file path (a /vsizip/ path for zipped scenes)
+#  products      the products of each scene found in the workspace (see PRODUCTS)
+#Only the main process of a script uses the catalog.
+
+import fnmatch
+import os
+import sqlite3
+
+import rasterio
+
+import raster_io
+
+CATALOG_NAME = 'scene_catalog.sqlite'
+
+#Sensor keys as used by the Landsat script, tested in this order against the scene ID
+LANDSAT_SENSORS = ['LC08', 'LE7', 'LT5', 'LT4']
+
+#Per-scene products, relative to the workspace; {} is the scene ID.  Raster products
+#are also found in the other output formats (raster_io.RASTER_EXTENSIONS).
+PRODUCTS = {
+    'stack': 'Stacks/{}_stack.vrt',
+    'toa': 'Toa_ref/{}_toa.img',
+    'msavi': 'MSAVI/{}_msavi.img',
+    'ndvi': 'NDVI/{}_ndvi.img',
+    'wdri': 'WDRI/{}_wdri.img',
+    'ndvi_masked': 'NDVI/ndvi_masked/{}_ndvi_masked.img',
+    'fmask': 'FMask_data/{}_MTLFmask.img',
+    'fmask_envi': 'FMask_data/{}_MTLFmask',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, name TEXT, mtime REAL);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT, name TEXT, size INTEGER, mtime REAL);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE TABLE IF NOT EXISTS scenes (scene_id TEXT PRIMARY KEY, sensor TEXT, path_row TEXT, acquired TEXT,
+    source TEXT, source_mtime REAL, width INTEGER, height INTEGER);
+CREATE TABLE IF NOT EXISTS bands (scene_id TEXT, band TEXT, path TEXT, PRIMARY KEY (scene_id, band));
+CREATE TABLE IF NOT EXISTS products (scene_id TEXT, product TEXT, path TEXT, size INTEGER, mtime REAL,
+    PRIMARY KEY (scene_id, product));
+'''
+
+
+#sensor, path/row (tile for Sentinel-2) and acquisition date (YYYY-MM-DD) from a scene ID;
+#fields that cannot be recognised are None
+def parse_scene_id(scene_id):
+    if scene_id.startswith('L1C_'):
+        #Sentinel-2 L1C_T<tile>_A<orbit>_<YYYYMMDD>T<time>
+        parts = scene_id.split('_')
+        date = parts[3][:8] if len(parts) > 3 else ''
+        tile = parts[1][1:] if len(parts) > 1 else None
+        return 'S2', tile, _date(date)
+    sensor = None
+    for key in LANDSAT_SENSORS:
+        if key in scene_id:
+            sensor = key
+            break
+    if len(scene_id) >= 25 and scene_id[4] == '_':
+        #collection naming LXSS_LLLL_PPPRRR_YYYYMMDD_...
+        return sensor, scene_id[10:16], _date(scene_id[17:25])
+    return sensor, None, None
+
+
+def _date(text):
+    if len(text) != 8 or not text.isdigit():
+        return None
+    return text[:4] + '-' + text[4:6] + '-' + text[6:]
+
+
+class SceneCatalog(object):
+    def __init__(self, root):
+        self.root = root.replace('\\', '/')
+        self.conn = sqlite3.connect(self.root + '/' + CATALOG_NAME)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    #bring the listing up to date with the file system, then drop scenes whose source
+    #is gone and recompute the product table
+    def refresh(self):
+        self._scan(self.root, os.path.dirname(self.root))
+        self.conn.execute('DELETE FROM scenes WHERE source NOT IN (SELECT path FROM files) '
+                          'AND source NOT IN (SELECT path FROM dirs)')
+        self.conn.execute('DELETE FROM bands WHERE scene_id NOT IN (SELECT scene_id FROM scenes)')
+        self.conn.execute('DELETE FROM products')
+        for product, template in PRODUCTS.items():
+            prefix, suffix = template.split('{}')
+            suffixes = [suffix]
+            if suffix.endswith(raster_io.RASTER_EXTENSIONS):
+                suffixes = [os.path.splitext(suffix)[0] + ext for ext in raster_io.RASTER_EXTENSIONS]
+            for suffix in suffixes:
+                self.conn.execute('INSERT OR REPLACE INTO products SELECT s.scene_id, ?, f.path, f.size, f.mtime '
+                                  'FROM scenes s JOIN files f ON f.path = ? || s.scene_id || ?',
+                                  (product, self.root + '/' + prefix, suffix))
+        self.conn.commit()
+
+    def _scan(self, folder, parent):
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            self._forget(folder)
+            return
+        row = self.conn.execute('SELECT mtime FROM dirs WHERE path = ?', (folder,)).fetchone()
+        if row is not None and row[0] == mtime:
+            subdirs = [r[0] for r in self.conn.execute('SELECT path FROM dirs WHERE parent = ?', (folder,))]
+        else:
+            files = []
+            subdirs = []
+            for entry in os.scandir(folder):
+                path = folder + '/' + entry.name
+                if entry.is_dir():
+                    subdirs.append(path)
+                elif entry.is_file() and entry.name != CATALOG_NAME and not entry.name.startswith(CATALOG_NAME):
+                    st = entry.stat()
+                    files.append((path, folder, entry.name, st.st_size, st.st_mtime))
+            self.conn.execute('DELETE FROM files WHERE dir = ?', (folder,))
+            self.conn.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?)', files)
+            known = [r[0] for r in self.conn.execute('SELECT path FROM dirs WHERE parent = ?', (folder,))]
+            for gone in set(known) - set(subdirs):
+                self._forget(gone)
+            self.conn.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)',
+                              (folder, parent, os.path.basename(folder), mtime))
+        for subdir in subdirs:
+            self._scan(subdir, folder)
+
+    def _forget(self, folder):
+        like = folder.replace('%', '\\%').replace('_', '\\_') + '/%'
+        self.conn.execute("DELETE FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (folder, like))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (folder, like))
+
+    def _under(self, table, column, folder, pattern, recursive):
+        folder = folder.replace('\\', '/').rstrip('/')
+        if recursive:
+            like = folder.replace('%', '\\%').replace('_', '\\_') + '/%'
+            rows = self.conn.execute("SELECT path, name FROM %s WHERE %s = ? OR %s LIKE ? ESCAPE '\\'"
+                                     % (table, column, column), (folder, like))
+        else:
+            rows = self.conn.execute('SELECT path, name FROM %s WHERE %s = ?' % (table, column), (folder,))
+        return sorted(path for path, name in rows if fnmatch.fnmatch(name, pattern))
+
+    #files in folder (and its subfolders if recursive) whose name matches pattern
+    def list_files(self, folder, pattern='*', recursive=False):
+        return self._under('files', 'dir', folder, pattern, recursive)
+
+    #subfolders of folder (at any depth if recursive) whose name matches pattern
+    def list_dirs(self, folder, pattern='*', recursive=False):
+        return self._under('dirs', 'parent', folder, pattern, recursive)
+
+    def exists(self, path):
+        return self.conn.execute('SELECT 1 FROM files WHERE path = ?', (path,)).fetchone() is not None
+
+    #latest mtime of a scene's source and of its band files outside a zip (whose own mtime
+    #covers its members), None if any is missing.  They are stat'ed rather than taken from
+    #the listing: a file overwritten in place leaves its folder's mtime unchanged, so
+    #refresh does not rescan the folder.
+    def _source_mtime(self, source, band_paths):
+        paths = [source] + [path for path in band_paths if not path.startswith('/vsizip/')]
+        try:
+            return max(os.stat(path).st_mtime for path in paths)
+        except OSError:
+            return None
+
+    #True if scene_id is catalogued from source and neither source nor the scene's band
+    #files have changed since
+    def is_current(self, scene_id, source):
+        row = self.conn.execute('SELECT source, source_mtime FROM scenes WHERE scene_id = ?', (scene_id,)).fetchone()
+        return row is not None and row[0] == source and \
+            row[1] == self._source_mtime(source, self.scene_bands(scene_id).values())
+
+    #add or update a scene; bands maps band names to file paths, the raster size is read
+    #from the header of the first band listed in band_order (or any band)
+    def register_scene(self, scene_id, source, bands, band_order=None):
+        sensor, pathRow, acquired = parse_scene_id(scene_id)
+        first = bands[band_order[0]] if band_order else sorted(bands.values())[0]
+        with rasterio.open(first) as src:
+            width, height = src.width, src.height
+        self.conn.execute('INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                          (scene_id, sensor, pathRow, acquired, source, self._source_mtime(source, bands.values()), width, height))
+        self.conn.execute('DELETE FROM bands WHERE scene_id = ?', (scene_id,))
+        self.conn.executemany('INSERT INTO bands VALUES (?, ?, ?)', [(scene_id, b, p) for b, p in bands.items()])
+        self.conn.commit()
+
+    #scene record as a dict, None if the scene is not catalogued
+    def scene(self, scene_id):
+        cursor = self.conn.execute('SELECT * FROM scenes WHERE scene_id = ?', (scene_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def scene_bands(self, scene_id):
+        return dict(self.conn.execute('SELECT band, path FROM bands WHERE scene_id = ?', (scene_id,)))
+
+    #{product: path} of the products of a scene present in the workspace
+    def products(self, scene_id):
+        return dict(self.conn.execute('SELECT product, path FROM products WHERE scene_id = ?', (scene_id,)))
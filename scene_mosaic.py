@@ -0,0 +1,102 @@
+#Native mosaicking of single-band index rasters (the masked NDVI of the scenes of a
+#period), replacing the mosaics built by hand in ERDAS.  The mosaic covers the union
+#of the scenes' extents on their common grid and is written block by block: for each
+#block only the scenes overlapping it are read, and only that block of the mosaic is
+#held in memory.  Where scenes overlap, the valid values are combined by a rule:
+#  max     maximum value composite
+#  mean    mean of the valid values
+#  latest  value of the most recent scene (the last in the list) that is valid there
+#  first   value of the earliest scene that is valid there
+#0, NaN and nodata count as not valid (masked NDVI is 0 under cloud and outside the
+#scene footprint); pixels no scene covers are 0.  The mosaic keeps the index storage
+#(float32 or scaled int16, see raster_io.INDEX_STORAGES) of the first scene.
+#With an area of interest, only the part of the union grid covering it is mosaicked.
+
+import math
+from contextlib import ExitStack
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+
+import raster_io
+
+RULES = ('max', 'mean', 'latest', 'first')
+
+#float32 units per mosaic pixel held by a block: the accumulator and one scene's
+#values (float64), the count and the validity mask
+VALUES_PER_PIXEL = 8
+
+
+#union grid of open rasters that share a CRS and pixel size; the scenes' origins are
+#assumed to lie on the same pixel lattice (as for Landsat/Sentinel-2 products of a zone)
+def union_grid(sources):
+    first = sources[0]
+    for src in sources[1:]:
+        if src.crs != first.crs or not np.allclose(src.res, first.res):
+            raise ValueError(src.name + ' is not on the CRS/pixel size of ' + first.name)
+    xRes, yRes = first.res
+    left = min(src.bounds.left for src in sources)
+    top = max(src.bounds.top for src in sources)
+    right = max(src.bounds.right for src in sources)
+    bottom = min(src.bounds.bottom for src in sources)
+    width = int(math.ceil(round((right - left) / xRes, 6)))
+    height = int(math.ceil(round((top - bottom) / yRes, 6)))
+    return raster_io.Grid(first.crs, Affine(xRes, 0, left, 0, -yRes, top), width, height)
+
+
+#union grid of the rasters at paths (headers only)
+def grid_of(paths):
+    with ExitStack() as stack:
+        return union_grid([stack.enter_context(rasterio.open(path)) for path in paths])
+
+
+def _overlaps(src, bounds):
+    left, bottom, right, top = bounds
+    return src.bounds.left < right and src.bounds.right > left and src.bounds.bottom < top and src.bounds.top > bottom
+
+
+#combine the scenes overlapping one block of the mosaic; returns real values, 0 where none is valid
+def _mosaic_block(sources, window, dst, rule):
+    bounds = dst.window_bounds(window)
+    shape = (window.height, window.width)
+    result = np.full(shape, np.nan)
+    count = np.zeros(shape, dtype=np.int32)
+    for src in sources:
+        if not _overlaps(src, bounds):
+            continue
+        values = raster_io.read_values(src, window, dst)
+        valid = ~np.isnan(values) & (values != 0)
+        if rule == 'max':
+            update = valid & ~(result >= values)
+        elif rule == 'mean':
+            update = valid & (count == 0)
+            result[valid & (count > 0)] += values[valid & (count > 0)]
+            count += valid
+        elif rule == 'latest':
+            update = valid
+        else:
+            update = valid & np.isnan(result)
+        result[update] = values[update]
+        if rule == 'first' and not np.isnan(result).any():
+            break
+    if rule == 'mean':
+        with np.errstate(invalid='ignore'):
+            result /= count
+    result[np.isnan(result)] = 0
+    return result
+
+
+#Mosaic the single-band index rasters at paths, in acquisition order, into out_path
+def mosaic_scenes(paths, out_path, rule='max', aoi=None):
+    if rule not in RULES:
+        raise ValueError('unknown mosaic rule ' + repr(rule) + ', expected one of ' + ', '.join(RULES))
+    with ExitStack() as stack:
+        sources = [stack.enter_context(rasterio.open(path)) for path in paths]
+        storage = raster_io.index_storage(sources[0])
+        grid = raster_io.clip_grid(union_grid(sources), aoi)
+        dst = stack.enter_context(raster_io.create_index(out_path, grid, storage))
+        for window in raster_io.block_windows([dst], VALUES_PER_PIXEL):
+            values = _mosaic_block(sources, window, dst, rule)
+            dst.write(raster_io.encode_index(values.astype(np.float32), storage), 1, window=window)
+    raster_io.commit_output(out_path)
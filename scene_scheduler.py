@@ -0,0 +1,102 @@
+#Process-pool scheduler for the native per-scene stages.
+#Every scene contributes a small dependency graph (stack -> toa -> indices -> mask).
+#A stage is started as soon as the stages it depends on have finished, so
+#independent scenes and independent index stages run side by side.  Admission is
+#limited both by the number of workers and by the estimated memory of the stages
+#already running.  A failed stage is reported and everything downstream of it is
+#skipped; the rest of the run carries on.  Each worker processes its rasters in
+#blocks within the memory budget divided by the number of workers.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import raster_io
+import run_report
+
+#Default number of worker processes and memory budget (bytes) for stages in flight
+WORKERS = os.cpu_count() or 1
+MEMORY_BUDGET = 4 * 1024 ** 3
+
+
+#One unit of work: func(*args) run in a worker process once every stage named in deps is done.
+#memory is the estimated peak working memory of the stage in bytes.  inputs and outputs
+#list the files the stage reads and writes (used by build_manifest to skip up-to-date stages).
+#pixels is the number of pixels (width x height) the stage processes, for the run report.
+class Stage(object):
+    def __init__(self, name, func, args=(), deps=(), memory=0, inputs=(), outputs=(), pixels=0):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = tuple(deps)
+        self.memory = memory
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.pixels = pixels
+
+
+#run one stage in a worker with the given block memory budget; returns its result and measurements
+def _run_stage(func, args, block_memory):
+    raster_io.BLOCK_MEMORY = block_memory
+    return run_report.measure(func, args)
+
+
+#Run a list of stages and return {stage name: 'done' | 'failed' | 'skipped'}.
+#Dependencies on stages that are not in the list are treated as already satisfied,
+#which lets callers leave out stages whose outputs are up to date.  on_done, if given,
+#is called in this process with each stage as soon as it has finished successfully.
+#Every stage is measured in its worker (see run_report.measure); report, if given,
+#is a run_report.RunReport that receives the measurements and status of each stage.
+def run_stages(stages, workers=WORKERS, memory_budget=MEMORY_BUDGET, on_done=None, report=None):
+    stages = dict((stage.name, stage) for stage in stages)
+    status = dict((name, None) for name in stages)
+    running = {}
+    inFlight = 0
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        while True:
+            changed = False
+            for name, stage in stages.items():
+                if status[name] is not None:
+                    continue
+                depStatus = [status[dep] for dep in stage.deps if dep in stages]
+                if 'failed' in depStatus or 'skipped' in depStatus:
+                    status[name] = 'skipped'
+                    changed = True
+                    if report:
+                        report.add_stage(stage, 'skipped')
+                    print('Skipping', name, '(an earlier stage failed)')
+                    continue
+                if any(s != 'done' for s in depStatus):
+                    continue
+                if len(running) >= workers:
+                    break
+                #always admit one stage so an oversized stage cannot stall the run
+                if running and inFlight + stage.memory > memory_budget:
+                    continue
+                status[name] = 'running'
+                inFlight += stage.memory
+                running[pool.submit(_run_stage, stage.func, stage.args, memory_budget // max(1, workers))] = name
+
+            if not running:
+                if changed:
+                    continue
+                break
+
+            finished, pending = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                inFlight -= stages[name].memory
+                try:
+                    result, metrics = future.result()
+                    status[name] = 'done'
+                    if report:
+                        report.add_stage(stages[name], 'done', metrics)
+                    if on_done:
+                        on_done(stages[name])
+                except Exception as e:
+                    status[name] = 'failed'
+                    if report:
+                        report.add_stage(stages[name], 'failed')
+                    print(name, 'failed:', e)
+
+    return status
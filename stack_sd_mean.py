@@ -1,57 +1,30 @@
-import sys, os, fnmatch, shutil, pprint
-from pathlib import Path
+import sys, os, pprint
+
+import area_of_interest
+import build_manifest
+import raster_io
+import run_report
+import scene_catalog
+import scene_scheduler
+import temporal_stats
 
 basePath = os.path.dirname(sys.argv[0]).replace("\\", "/")
 
-header = '''# Input Layers: fC Integer, mosaic, gapfilled (modify to add or delete layers)
-#
-# set cell size for the model
-#
-SET CELLSIZE MIN;
-#
-# set window for the model
-#
-SET WINDOW INTERSECTION;
-#
-# set area of interest for the model
-#
-SET AOI NONE;
-#
-# declarations
-#
-'''
-
-def FindModelerExe():
-    if not os.path.exists(basePath + '/modeler_location.txt'):
-        f = open(basePath + '/modeler_location.txt', 'w')
-        searchdir = [] #list of possible ERDAS install locations
-        for root, dirs, files in os.walk('C:\Program Files\\'):
-            for dir in dirs:
-                if dir == 'Hexagon':
-                    searchdir.append(os.path.join(root, dir))
-                    print (os.path.join(root,dir))
-        for i in range (0, len(searchdir)):
-            for root, dirs, files in os.walk(searchdir[i]):
-                for exe in fnmatch.filter(files, '*.exe'):
-                    if exe == 'modeler.exe':
-                        modeler = os.path.join(root, exe)
-                    elif exe == 'imagecommand.exe':
-                        imagecommand = os.path.join(root, exe)
-                    elif exe == 'imgcopy.exe':
-                        imgcopy = os.path.join(root, exe)
-        modeler = '"' + modeler + '" @'
-        imagecommand = '"' + imagecommand + '" @'
-        imgcopy = '"' + imgcopy + '" @'
-
-        f.write("{}\n{}\n{}".format(modeler, imagecommand, imgcopy))
-        f.close()
-        return modeler, imagecommand, imgcopy
-    f = open(basePath + '/modeler_location.txt')
-    paths = []
-    for line in f:
-        paths.append(line.strip())
-    f.close()
-    return paths[0], paths[1], paths[2]
+#Format of the mean/SD products: 'HFA' writes ERDAS .img files, 'COG' compressed
+#Cloud-Optimized GeoTIFFs (.tif) with overviews
+OUTPUT_FORMAT = 'HFA'
+
+#Area of interest: None processes the whole layers.  A (west, south, east, north) box in
+#degrees of longitude/latitude, or the path of a GeoJSON polygon file (relative to the
+#workspace), restricts the mean/SD products to the pixels covering it (see area_of_interest.py)
+AOI = None
+
+#Memory budget (MB) for the blocks of the mean/SD stage
+MEMORY_BUDGET_MB = 4096
+
+#The timing of the mean/SD stage is written to sd_mean_Report_stages.json/.csv in the
+#workspace; set WRITE_TRACE to True to also write the sd_mean_Report_trace.json timeline
+WRITE_TRACE = False
 
 def CheckOutputDir():
     if not os.path.exists(basePath + '/NDVI/ndvi_sd_mean_stack'):
@@ -60,62 +33,38 @@ def CheckOutputDir():
 def get_ndvi_mos_gp_files():
     ndvi_mos_gp_files = []
 
-    for root, dirs, files in os.walk(basePath + '/NDVI/ndvi_mos_gp/'):
-        for img in fnmatch.filter(files, "*.img"):
-            ndvi_mos_gp_files.append((os.path.join(root, img).replace("\\", "/"), img[:img.find('.img')]))
-        break
+    catalog = scene_catalog.SceneCatalog(basePath)
+    catalog.refresh()
+    for path in catalog.list_files(basePath + '/NDVI/ndvi_mos_gp', "*.img") + \
+            catalog.list_files(basePath + '/NDVI/ndvi_mos_gp', "*.tif"):
+        img = os.path.basename(path)
+        ndvi_mos_gp_files.append((path, os.path.splitext(img)[0]))
+    catalog.close()
 
     return ndvi_mos_gp_files
 
-def generate_param(files, modeler):
-
-    f = open(basePath + '/NDVI/ndvi_mos_gp/' + "paramA", 'w')
-    f.write(header)
-    counter = 1
-    for path, name in files:
-        f.write('Integer RASTER n{}_{} FILE OLD PUBINPUT NEAREST NEIGHBOR AOI NONE "{}";\n'.format(counter, name, path.lower()))
-        counter += 1
-    stack_name = name[:name.find('_')]
-    f.write("Integer RASTER n25_temp;\n")
-    f.write('Integer RASTER n26_{}_ndvi_fc_stack_mean FILE DELETE_IF_EXISTING PUBOUT USEALL ATHEMATIC 8 BIT UNSIGNED INTEGER "{}/ndvi/ndvi_sd_mean_stack/{}_ndvi_fc_stack_mean.img";\n'.format(stack_name, basePath, stack_name))
-    f.write('Integer RASTER n27_{}_ndvi_fc_stack_sd FILE DELETE_IF_EXISTING PUBOUT USEALL ATHEMATIC 8 BIT UNSIGNED INTEGER "{}/ndvi/ndvi_sd_mean_stack/{}_ndvi_fc_stack_sd.img";\n'.format(stack_name, basePath, stack_name))
-    f.write('Integer RASTER n28_{}_ndvi_fc_stack_10_mean_sd FILE DELETE_IF_EXISTING PUBOUT USEALL ATHEMATIC 8 BIT UNSIGNED INTEGER "{}/ndvi/ndvi_sd_mean_stack/{}_ndvi_fc_stack_10_mean_sd.img";\n'.format(stack_name, basePath.lower(), stack_name.lower()))
-    f.write('''#
-# function definitions
-#\n''')
-    counter = 1
-    layers = ""
-    for path, name in files:
-        layers += 'n{}_{}, '.format(counter, name)
-        counter += 1
-    layers = layers[:-2]
-    f.write('n25_temp = STACKLAYERS ( {} ) ;\n'.format(layers))
-    f.write('n26_{}_ndvi_fc_stack_mean = STACK MEAN ( $n25_temp ) ;\n'.format(stack_name))
-    f.write('n27_{}_ndvi_fc_stack_sd = STACK SD ( $n25_temp ) ;\n'.format(stack_name))
-    f.write('n28_{}_ndvi_fc_stack_10_mean_sd = STACKLAYERS ( $n25_temp, $n26_{}_ndvi_fc_stack_mean, n27_{}_ndvi_fc_stack_sd ) ;\n'.format(stack_name, stack_name, stack_name))
-    f.write('QUIT;')
-    f.close()
-    f = open(basePath + '/NDVI/ndvi_mos_gp/' + "paramB", 'w')
-    f.write('5\n'\
-        'modeler\n'\
-        '-nq\n'\
-        + basePath + '/NDVI/ndvi_mos_gp/' + 'paramA\n'\
-        '-meter\n'\
-        '-state\n')
-    f.close()
-    return modeler + basePath + '/NDVI/ndvi_mos_gp/paramB'
-
-def getBatchFile(param):
-    f = open(basePath + '/NDVI/ndvi_mos_gp/' + 'batch_process.bat', 'w')
-    f.write(str(param).replace('\\', '/') + '\n')
-    f.close()
-
-def RunBatch():
-    try:
-        os.chdir(basePath + '/NDVI/ndvi_mos_gp/')
-        os.system('batch_process.bat')
-    except WindowsError:
-        print('error')
+def generate_stats(files, report=None):
+
+    stack_name = files[-1][1][:files[-1][1].find('_')]
+    out_dir = basePath + '/NDVI/ndvi_sd_mean_stack/'
+    ext = raster_io.FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+
+    layers = [path for path, name in files]
+    outputs = [out_dir + stack_name + '_ndvi_fc_stack_mean' + ext, out_dir + stack_name + '_ndvi_fc_stack_sd' + ext,
+               out_dir + stack_name + '_ndvi_fc_stack_10_mean_sd' + ext]
+
+    manifest = build_manifest.Manifest(basePath + '/manifest.jsonl')
+    report = report or run_report.RunReport()
+    aoi = area_of_interest.load(AOI, basePath)
+    raster_io.BLOCK_MEMORY = MEMORY_BUDGET_MB * 1024 ** 2
+    stage = scene_scheduler.Stage(stack_name + ':stack_sd_mean', temporal_stats.stack_mean_sd, [layers] + outputs + [aoi],
+                                  inputs=layers, outputs=outputs, pixels=len(layers) * raster_io.pixel_count(layers[0], aoi))
+    if manifest.is_current(stage):
+        report.add_up_to_date([stage], [])
+        return False
+    report.run_stage(stage)
+    manifest.record(stage)
+    return True
 
 def main():
     print("Script created by: Nikit Parakh")
@@ -125,22 +74,18 @@ def main():
 
     CheckOutputDir()
 
-    print ('Searching for ERDAS .exe file location')
-    ModelerLocation, ImageCommandLocation, ImgCopyLocation = FindModelerExe()
-    print ('Done Searching\n')
-
     file_details = get_ndvi_mos_gp_files()
     if len(file_details) != 0:
         print('Files to be processed:')
         pprint.pprint([i[1] for i in file_details])
         print()
-        print('Generating batchlist for processing')
-        batchList = generate_param(file_details, ModelerLocation)
-        print('\nCreating Batch File')
-        getBatchFile(batchList)
-
-        print ('Running batch file in ERDAS modeler...')
-        RunBatch()
+        print('Calculating per-pixel mean and SD of the stack...')
+        report = run_report.RunReport()
+        if generate_stats(file_details, report):
+            print('Done')
+        else:
+            print('Mean and SD are already up to date!')
+        report.write(basePath + '/sd_mean_Report', WRITE_TRACE)
 
 
 if __name__ == '__main__':
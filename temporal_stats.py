@@ -0,0 +1,142 @@
+#Native per-pixel mean and standard deviation through a time series of rasters,
+#replacing the ERDAS STACKLAYERS / STACK MEAN / STACK SD model of stack_sd_mean.
+#The layers are streamed strip by strip into running per-pixel Welford
+#accumulators (float64), so memory follows the block size rather than the number
+#of dates and no temporary layer stack is written.  Layers on a different extent
+#than the first are read on its grid.
+#gap_fill produces the gap-filled series (ndvi_mos_gp) the statistics are computed
+#from: in each block, the values of all the dates are filled at once along the time
+#axis by linear interpolation between the nearest valid dates before and after.
+#Given an area of interest (aoi), both only read and write the part of the grid covering it.
+
+from contextlib import ExitStack
+
+import numpy as np
+import rasterio
+
+import raster_io
+import scene_mosaic
+
+
+#add one layer of a strip to the running count/mean/M2 accumulators (in place);
+#pixels where valid is False are left out
+def welford_update(count, mean, m2, values, valid):
+    count += valid
+    delta = values - mean
+    mean += np.where(valid, delta / np.maximum(count, 1), 0)
+    m2 += np.where(valid, delta * (values - mean), 0)
+
+
+#mean and (population) standard deviation from the accumulators, 0 where no layer was valid
+def welford_result(count, mean, m2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sd = np.where(count > 0, np.sqrt(m2 / count), 0)
+    return np.where(count > 0, mean, 0), sd
+
+
+def _to_uint8(values):
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+#True if the values of src are plain integers (no scale/offset), like the fC layers
+def _is_integer(src):
+    return np.issubdtype(np.dtype(src.dtypes[0]), np.integer) and src.scales[0] == 1 and src.offsets[0] == 0
+
+
+#Write the per-pixel mean and SD of layer_paths.  If stack_path is given, the layers
+#followed by the mean and SD are also written there as one multi-band raster (the
+#_10_mean_sd product).  Integer layers (the fC layers the ERDAS model was given) give
+#8-bit products as before; index layers such as the gap-filled NDVI give index rasters
+#in the storage of the first layer (see raster_io.INDEX_STORAGES), as rounding an NDVI
+#mean to an integer would leave only 0 and 1.  Nodata pixels of a layer, where it
+#defines one, and NaN pixels do not count towards that pixel's statistics.  Scaled
+#layers (see raster_io.read_values) contribute their real values.
+def stack_mean_sd(layer_paths, mean_path, sd_path, stack_path=None, aoi=None):
+    with ExitStack() as stack:
+        sources = [stack.enter_context(rasterio.open(path)) for path in layer_paths]
+        template = raster_io.clip_grid(sources[0], aoi)
+        integer = all(_is_integer(src) for src in sources)
+        if integer:
+            create = lambda path, count: raster_io.create_like(path, template, count, 'uint8')
+            encode = _to_uint8
+        else:
+            storage = raster_io.index_storage(sources[0])
+            create = lambda path, count: raster_io.create_index(path, template, storage, count)
+            encode = lambda values: raster_io.encode_index(values.astype(np.float32), storage)
+        meanDst = stack.enter_context(create(mean_path, 1))
+        sdDst = stack.enter_context(create(sd_path, 1))
+        stackDst = None
+        if stack_path:
+            stackDst = stack.enter_context(create(stack_path, len(sources) + 2))
+
+        outputs = [meanDst, sdDst] + ([stackDst] if stackDst is not None else [])
+        for window in raster_io.block_windows(outputs + sources, 11):
+            shape = (window.height, window.width)
+            count = np.zeros(shape, dtype=np.int32)
+            mean = np.zeros(shape)
+            m2 = np.zeros(shape)
+            for band, src in enumerate(sources, 1):
+                values = raster_io.read_values(src, window, meanDst)
+                valid = ~np.isnan(values)
+                if stackDst is not None:
+                    #uint8 layers keep their nodata value, index layers their NaN (nodata)
+                    layer = np.where(valid, values, src.nodata or 0) if integer else values
+                    stackDst.write(encode(layer), band, window=window)
+                welford_update(count, mean, m2, np.where(valid, values, 0), valid)
+
+            layerMean, layerSd = welford_result(count, mean, m2)
+            meanDst.write(encode(layerMean), 1, window=window)
+            sdDst.write(encode(layerSd), 1, window=window)
+            if stackDst is not None:
+                stackDst.write(encode(layerMean), len(sources) + 1, window=window)
+                stackDst.write(encode(layerSd), len(sources) + 2, window=window)
+
+    for path in [mean_path, sd_path, stack_path]:
+        if path:
+            raster_io.commit_output(path)
+
+
+#Fill the invalid entries of values, a (dates, ...) array with NaN where invalid,
+#along the time axis: linearly between the nearest valid dates before and after
+#(times holds the date of each layer, e.g. in days), or with the nearest valid
+#value where there is one on one side only.  Pixels with no valid date stay NaN.
+def fill_gaps(values, times):
+    times = np.asarray(times, dtype=np.float64)
+    count = len(values)
+    valid = ~np.isnan(values)
+    positions = np.arange(count).reshape((-1,) + (1,) * (values.ndim - 1))
+    #position of the nearest valid date at or before / at or after each date
+    before = np.maximum.accumulate(np.where(valid, positions, -1), axis=0)
+    after = np.minimum.accumulate(np.where(valid, positions, count)[::-1], axis=0)[::-1]
+    #with a valid date on one side only, both ends are that date (nearest valid value)
+    before, after = np.where(before >= 0, before, after), np.where(after < count, after, before)
+    before, after = np.clip(before, 0, count - 1), np.clip(after, 0, count - 1)
+    valueBefore = np.take_along_axis(values, before, axis=0)
+    valueAfter = np.take_along_axis(values, after, axis=0)
+    timeBefore, timeAfter = times[before], times[after]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(timeAfter > timeBefore, (times[positions] - timeBefore) / (timeAfter - timeBefore), 0)
+    return np.where(valid, values, valueBefore + (valueAfter - valueBefore) * weight)
+
+
+#Gap-fill a time series of single-band index rasters (in date order, times as for
+#fill_gaps) into out_paths.  0, NaN and nodata pixels are gaps; pixels without any
+#valid date are 0.  The outputs are on the union grid of the layers and keep the
+#index storage of each layer.
+def gap_fill(layer_paths, times, out_paths, aoi=None):
+    with ExitStack() as stack:
+        sources = [stack.enter_context(rasterio.open(path)) for path in layer_paths]
+        grid = raster_io.clip_grid(scene_mosaic.union_grid(sources), aoi)
+        storages = [raster_io.index_storage(src) for src in sources]
+        outputs = [stack.enter_context(raster_io.create_index(path, grid, storage))
+                   for path, storage in zip(out_paths, storages)]
+        #the layer stack (float64) and the before/after positions, values and times of the gaps
+        for window in raster_io.block_windows(outputs, 16 * len(sources)):
+            values = np.stack([raster_io.read_values(src, window, outputs[0]) for src in sources])
+            values[values == 0] = np.nan
+            filled = np.nan_to_num(fill_gaps(values, times))
+            for layer, dst, storage in zip(filled, outputs, storages):
+                dst.write(raster_io.encode_index(layer.astype(np.float32), storage), 1, window=window)
+
+    for path in out_paths:
+        raster_io.commit_output(path)
@@ -0,0 +1,49 @@
+#fractional_cover statistics and endmembers against numpy on a small NDVI mosaic
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+import fractional_cover
+import raster_io
+
+
+@pytest.fixture
+def mosaic(tmp_path):
+    values = np.random.default_rng(2).uniform(-0.1, 0.85, (40, 30)).astype(np.float32)
+    values[:3, :4] = np.nan
+    path = str(tmp_path / 'mosaic.img')
+    with rasterio.open(path, 'w', driver='HFA', width=30, height=40, count=1, dtype='float32',
+                       crs='EPSG:32633', transform=from_origin(500000, 4001200, 30, 30)) as dst:
+        dst.write(values, 1)
+    return path, values[~np.isnan(values)].astype(np.float64)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_statistics_match_numpy(mosaic, workers, monkeypatch):
+    path, valid = mosaic
+    #small blocks, so that the workers merge several partial statistics
+    monkeypatch.setattr(raster_io, 'BLOCK_MEMORY', 30 * 8 * 4 * 3)
+    stats = fractional_cover.mosaic_statistics(path, workers)
+    assert stats['count'] == valid.size
+    assert stats['min'] == valid.min() and stats['max'] == valid.max()
+    assert stats['sd'] == pytest.approx(valid.std(), rel=1e-9)
+    assert set(np.trunc(valid * 100).astype(int)) <= set(stats['values'])
+
+
+def test_sd_endmembers_follow_the_erdas_rule(mosaic):
+    path, valid = mosaic
+    stats = fractional_cover.mosaic_statistics(path, 1)
+    soil, veg = fractional_cover.endmembers(stats, 'sd')
+    assert soil == pytest.approx((valid.min() + 1.5 * valid.std()) * 100)
+    assert veg == pytest.approx((valid.max() - 1.5 * valid.std()) * 100)
+    low, high = fractional_cover.endmembers(stats, 'percentile')
+    assert low == pytest.approx(np.percentile(valid, 5) * 100, abs=0.05)
+    assert high == pytest.approx(np.percentile(valid, 95) * 100, abs=0.05)
+    with pytest.raises(ValueError):
+        fractional_cover.endmembers(stats, 'median')
+
+
+def test_unscaled_fc():
+    fc = fractional_cover.unscaled_fc(np.array([0.0, 10, 20, 50, 80, 90]), 20.0, 80.0)
+    np.testing.assert_array_equal(fc, [0, 1, 1, 50, 100, 116])
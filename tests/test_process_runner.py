@@ -0,0 +1,88 @@
+#process_runner against a local stand-in for the external executables (Fmask, imgcopy):
+#a small Python script whose behaviour is picked by its first argument
+import json
+import sys
+
+import process_runner
+
+STAND_IN = '''
+import os, sys, time
+mode = sys.argv[1]
+if mode == 'ok':
+    open('ran.txt', 'w').close()
+    print('converted')
+    sys.exit(0)
+if mode == 'fail':
+    sys.stderr.write('reading input\\nERROR: bad input file\\n')
+    sys.exit(3)
+if mode == 'sleep':
+    time.sleep(30)
+if mode == 'flaky':
+    #fails until it has been started the given number of times
+    counter = sys.argv[2]
+    runs = int(open(counter).read()) + 1 if os.path.exists(counter) else 1
+    open(counter, 'w').write(str(runs))
+    sys.exit(0 if runs >= int(sys.argv[3]) else 1)
+'''
+
+
+def _stand_in(tmp_path):
+    path = tmp_path / 'stand_in.py'
+    path.write_text(STAND_IN)
+    return [sys.executable, str(path)]
+
+
+def test_success_runs_in_cwd(tmp_path):
+    result = process_runner.run_jobs([process_runner.Job('ok', _stand_in(tmp_path) + ['ok'], cwd=str(tmp_path))])[0]
+    assert result['ok'] and result['returncode'] == 0 and result['attempts'] == 1
+    assert (tmp_path / 'ran.txt').exists()
+
+
+def test_failure_captures_exit_code_and_stderr(tmp_path):
+    result = process_runner.run_jobs([process_runner.Job('fail', _stand_in(tmp_path) + ['fail'])])[0]
+    assert not result['ok']
+    assert result['returncode'] == 3
+    assert result['stderr'].splitlines()[-1] == 'ERROR: bad input file'
+
+
+def test_timeout(tmp_path):
+    result = process_runner.run_jobs([process_runner.Job('sleep', _stand_in(tmp_path) + ['sleep'], timeout=1)])[0]
+    assert not result['ok'] and result['returncode'] is None
+    assert 'timed out' in result['stderr']
+    assert result['seconds'] < 10
+
+
+def test_retry_until_success(tmp_path):
+    counter = str(tmp_path / 'runs')
+    job = process_runner.Job('flaky', _stand_in(tmp_path) + ['flaky', counter, 3], retries=2)
+    result = process_runner.run_jobs([job])[0]
+    assert result['ok'] and result['attempts'] == 3
+
+
+def test_retries_exhausted(tmp_path):
+    counter = str(tmp_path / 'runs')
+    job = process_runner.Job('flaky', _stand_in(tmp_path) + ['flaky', counter, 5], retries=1)
+    result = process_runner.run_jobs([job])[0]
+    assert not result['ok'] and result['attempts'] == 2 and result['returncode'] == 1
+
+
+def test_failed_job_does_not_stop_the_others(tmp_path):
+    standIn = _stand_in(tmp_path)
+    jobs = [process_runner.Job('fail', standIn + ['fail']),
+            process_runner.Job('missing', [str(tmp_path / 'no_such_tool.exe')]),
+            process_runner.Job('ok', standIn + ['ok'], cwd=str(tmp_path))]
+    done = []
+    results = process_runner.run_jobs(jobs, workers=2, on_done=done.append)
+    assert [r['name'] for r in results] == ['fail', 'missing', 'ok']
+    assert [r['ok'] for r in results] == [False, False, True]
+    assert results[1]['returncode'] is None and results[1]['stderr']
+    assert sorted(r['name'] for r in done) == ['fail', 'missing', 'ok']
+
+
+def test_write_log_appends(tmp_path):
+    results = process_runner.run_jobs([process_runner.Job('ok', _stand_in(tmp_path) + ['ok'], cwd=str(tmp_path))])
+    log = str(tmp_path / 'external_jobs.jsonl')
+    process_runner.write_log(results, log)
+    process_runner.write_log(results, log)
+    lines = [json.loads(line) for line in open(log)]
+    assert len(lines) == 2 and lines[0]['name'] == 'ok' and lines[0]['ok']
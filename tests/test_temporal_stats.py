@@ -0,0 +1,107 @@
+#temporal_stats on small rasters written to a temporary folder
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+import raster_io
+import temporal_stats
+
+
+def _write(path, values, dtype='float32'):
+    with rasterio.open(str(path), 'w', driver='HFA', width=values.shape[1], height=values.shape[0], count=1,
+                       dtype=dtype, crs='EPSG:32633', transform=from_origin(500000, 4000080, 30, 30)) as dst:
+        dst.write(values.astype(dtype), 1)
+    return str(path)
+
+
+def _read(path):
+    with rasterio.open(path) as src:
+        return raster_io.read_values(src, None)
+
+
+def test_gap_filled_ndvi_mean_sd_keep_their_range(tmp_path):
+    rng = np.random.default_rng(0)
+    layers = []
+    for i in range(4):
+        values = rng.uniform(-0.2, 0.9, (6, 5))
+        values[i, :] = 0
+        layers.append(_write(tmp_path / ('%d_ndvi_mos.img' % i), values))
+    filled = [str(tmp_path / ('%d_ndvi_mos_gp.img' % i)) for i in range(4)]
+    temporal_stats.gap_fill(layers, [0, 30, 60, 90], filled)
+    paths = [str(tmp_path / name) for name in ['mean.img', 'sd.img', 'stack.img']]
+    temporal_stats.stack_mean_sd(filled, *paths)
+
+    series = np.stack([_read(path) for path in filled])
+    mean, sd = _read(paths[0]), _read(paths[1])
+    assert series.min() >= -0.2 and series.max() <= 0.9
+    assert np.all(mean >= series.min(axis=0) - 1e-6) and np.all(mean <= series.max(axis=0) + 1e-6)
+    np.testing.assert_allclose(mean, series.mean(axis=0), atol=1e-6)
+    np.testing.assert_allclose(sd, series.std(axis=0), atol=1e-6)
+    assert len(np.unique(mean)) > 2
+    with rasterio.open(paths[2]) as src:
+        assert src.count == 6
+        np.testing.assert_allclose(src.read(5), mean)
+
+
+def test_int16_ndvi_gives_scaled_mean_sd(tmp_path):
+    layers = [_write(tmp_path / 'a.img', np.full((3, 3), 1500), 'int16'),
+              _write(tmp_path / 'b.img', np.full((3, 3), 4500), 'int16')]
+    for path in layers:
+        with rasterio.open(path, 'r+') as dst:
+            dst.scales = (1.0 / raster_io.INDEX_SCALE,)
+    mean, sd = str(tmp_path / 'mean.img'), str(tmp_path / 'sd.img')
+    temporal_stats.stack_mean_sd(layers, mean, sd)
+    with rasterio.open(mean) as src:
+        assert src.dtypes[0] == 'int16'
+    np.testing.assert_allclose(_read(mean), 0.3)
+    np.testing.assert_allclose(_read(sd), 0.15)
+
+
+def test_fc_layers_stay_8_bit(tmp_path):
+    layers = [_write(tmp_path / 'a.img', np.full((3, 3), 20), 'uint8'),
+              _write(tmp_path / 'b.img', np.full((3, 3), 61), 'uint8')]
+    mean, sd = str(tmp_path / 'mean.img'), str(tmp_path / 'sd.img')
+    temporal_stats.stack_mean_sd(layers, mean, sd)
+    with rasterio.open(mean) as src:
+        assert src.dtypes[0] == 'uint8'
+        assert np.all(src.read(1) == 40)
+    with rasterio.open(sd) as src:
+        assert np.all(src.read(1) == 20)
+
+
+def test_welford_matches_numpy():
+    rng = np.random.default_rng(3)
+    layers = rng.uniform(-5, 200, (7, 4, 5))
+    valid = rng.random((7, 4, 5)) > 0.3
+    valid[:, 0, 0] = False
+    count = np.zeros((4, 5), dtype=np.int32)
+    mean = np.zeros((4, 5))
+    m2 = np.zeros((4, 5))
+    for values, ok in zip(layers, valid):
+        temporal_stats.welford_update(count, mean, m2, np.where(ok, values, 0), ok)
+    layerMean, layerSd = temporal_stats.welford_result(count, mean, m2)
+
+    masked = np.ma.masked_array(layers, ~valid)
+    np.testing.assert_array_equal(count, valid.sum(axis=0))
+    np.testing.assert_allclose(layerMean, masked.mean(axis=0).filled(0), rtol=1e-12)
+    np.testing.assert_allclose(layerSd, masked.std(axis=0).filled(0), rtol=1e-12, atol=1e-12)
+    assert layerMean[0, 0] == 0 and layerSd[0, 0] == 0
+
+
+def test_fill_gaps():
+    nan = np.nan
+    values = np.array([[nan, nan, 0.1, 0.5],
+                       [0.2, nan, nan, nan],
+                       [nan, nan, nan, 0.3],
+                       [0.6, nan, nan, nan]])
+    filled = temporal_stats.fill_gaps(values, [0, 10, 30, 40])
+    #interpolated in time between the valid dates before and after
+    np.testing.assert_allclose(filled[:, 0], [0.2, 0.2, 0.2 + 0.4 * 20 / 30, 0.6])
+    #no valid date: stays NaN
+    assert np.all(np.isnan(filled[:, 1]))
+    #valid dates on one side only: the nearest valid value
+    np.testing.assert_allclose(filled[:, 2], [0.1, 0.1, 0.1, 0.1])
+    #interpolated inside the series, nearest valid value after its last valid date
+    np.testing.assert_allclose(filled[:, 3], [0.5, 0.5 - 0.2 * 10 / 30, 0.3, 0.3])
+    #valid values are kept
+    assert filled[3, 0] == 0.6 and filled[2, 3] == 0.3
@@ -0,0 +1,71 @@
+#vegetation_indices on hand-computed pixels, and the fused mode against the staged one
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+import raster_io
+import toa_reflectance
+import vegetation_indices
+
+#red, nir and the expected NDVI, MSAVI2 and WDRI; the last pixel's NDVI (-2.33) and
+#WDRI (-1.08) are out of range and so 0
+PIXELS = [
+    (0.1, 0.5, 0.666667, 0.552786, -0.333333),
+    (0.3, 0.2, -0.2, -0.130662, -0.875),
+    (0.0, 0.0, 0.0, 0.0, 0.0),
+    (-0.05, 0.02, 0.0, 0.158891, 0.0),
+]
+
+
+@pytest.mark.parametrize('index, column', [('ndvi', 2), ('msavi', 3), ('wdri', 4)])
+def test_hand_computed_pixels(index, column):
+    red = np.array([p[0] for p in PIXELS], dtype=np.float32)
+    nir = np.array([p[1] for p in PIXELS], dtype=np.float32)
+    values = vegetation_indices.INDICES[index](red, nir)
+    assert values.dtype == np.float32
+    np.testing.assert_allclose(values, [p[column] for p in PIXELS], atol=1e-6)
+
+
+def test_apply_mask_keeps_clear_land_only():
+    values = np.array([0.5, -0.2, 0.7, 0.3], dtype=np.float32)
+    masked = vegetation_indices.apply_mask(values, np.array([0, 1, 2, 4]))
+    np.testing.assert_array_equal(masked, [0.5, 0, 0, 0])
+
+
+def _write_band(path, values):
+    with rasterio.open(path, 'w', driver='GTiff', width=values.shape[1], height=values.shape[0], count=1,
+                       dtype='uint8', crs='EPSG:32633', transform=from_origin(500000, 4000090, 30, 30)) as dst:
+        dst.write(values, 1)
+    return path
+
+
+@pytest.mark.parametrize('storage', raster_io.INDEX_STORAGES)
+def test_fused_matches_staged(tmp_path, storage):
+    rng = np.random.default_rng(1)
+    bands = [_write_band(str(tmp_path / ('B%d.TIF' % b)), rng.integers(0, 255, (7, 9)).astype(np.uint8))
+             for b in toa_reflectance.STACK_BANDS['LT5']]
+    mask = _write_band(str(tmp_path / 'fmask.TIF'), rng.choice(np.array([0, 0, 1, 4], dtype=np.uint8), (7, 9)))
+    scale, offset = toa_reflectance.toa_coefficients('LT5', [0.77, 1.45, 1.04, 0.88, 0.12, 0.066],
+                                                     [-2.3, -4.3, -2.2, -2.4, -0.49, -0.22], 1.01, 40.0)
+    toaBands = list(range(6))
+
+    fused = dict((name, str(tmp_path / ('fused_' + name + '.img'))) for name in vegetation_indices.INDICES)
+    fusedMasked = {'ndvi': str(tmp_path / 'fused_ndvi_masked.img')}
+    vegetation_indices.process_scene(bands, toaBands, scale, offset, fused, str(tmp_path / 'fused_toa.img'),
+                                     mask, fusedMasked, storage)
+
+    stack, toa = str(tmp_path / 'stack.vrt'), str(tmp_path / 'toa.img')
+    raster_io.build_virtual_stack(bands, stack)
+    toa_reflectance.calibrate_scene(stack, [b + 1 for b in toaBands], scale, offset, toa)
+    for name in vegetation_indices.INDICES:
+        staged = str(tmp_path / (name + '.img'))
+        vegetation_indices.index_scene(toa, name, staged, storage)
+        with rasterio.open(staged) as a, rasterio.open(fused[name]) as b:
+            assert a.dtypes[0] == b.dtypes[0]
+            np.testing.assert_array_equal(a.read(1), b.read(1))
+    vegetation_indices.mask_scene(str(tmp_path / 'ndvi.img'), mask, str(tmp_path / 'ndvi_masked.img'))
+    with rasterio.open(str(tmp_path / 'ndvi_masked.img')) as a, rasterio.open(fusedMasked['ndvi']) as b:
+        np.testing.assert_array_equal(a.read(1), b.read(1))
+    with rasterio.open(toa) as a, rasterio.open(str(tmp_path / 'fused_toa.img')) as b:
+        np.testing.assert_array_equal(a.read(), b.read())
@@ -0,0 +1,75 @@
+#Native DN to top-of-atmosphere reflectance calibration for Landsat 4 TM, 5 TM,
+#7 ETM+ and 8 OLI scenes.  This replaces the ERDAS _atmcorrParamA models: the
+#earth-sun distance, ESUN and sun zenith cosine are folded into one scale and
+#one offset per band, so every pixel costs a single multiply-add.
+
+import math
+
+import numpy as np
+import rasterio
+
+import raster_io
+
+#Solar exoatmospheric irradiance of the six reflective TOA layers for each sensor
+ESUN = {
+    'LC08': (2067, 1893, 1603, 972.6, 245, 79.72),
+    'LE7': (1997, 1812, 1533, 1039, 230.8, 84.9),
+    'LT5': (1983, 1796, 1536, 1031, 220.0, 83.44),
+    'LT4': (1983, 1795, 1539, 1028, 219.8, 83.49),
+}
+
+#Band numbers (as in the _B<n>.TIF file names) making up the six TOA layers
+BANDS = {
+    'LC08': (2, 3, 4, 5, 6, 7),
+    'LE7': (1, 2, 3, 4, 5, 7),
+    'LT5': (1, 2, 3, 4, 5, 7),
+    'LT4': (1, 2, 3, 4, 5, 7),
+}
+
+#Band numbers making up the DN stack of each sensor
+STACK_BANDS = {
+    'LC08': (1, 2, 3, 4, 5, 6, 7),
+    'LE7': (1, 2, 3, 4, 5, 7),
+    'LT5': (1, 2, 3, 4, 5, 7),
+    'LT4': (1, 2, 3, 4, 5, 7),
+}
+
+
+#Fold radiance rescaling, ESUN, earth-sun distance and sun elevation into per-band
+#scale/offset arrays so that TOA = DN * scale + offset.  For one scene gain/bias hold
+#the six band values and esdist/sunelev are numbers; for n scenes at once they are
+#(n, 6) and (n,) arrays and so are the results.
+def toa_coefficients(sensor, gain, bias, esdist, sunelev):
+    gain = np.asarray(gain, dtype=np.float64)
+    bias = np.asarray(bias, dtype=np.float64)
+    esun = np.asarray(ESUN[sensor], dtype=np.float64)
+    esdist = np.asarray(esdist, dtype=np.float64)[..., None]
+    sunelev = np.asarray(sunelev, dtype=np.float64)[..., None]
+    cosZenith = np.cos(np.radians(90 - sunelev))
+    #sun at or below the horizon: every band is written as zeros.  ERDAS wrote 0 when the
+    #cosine was 0 but negative reflectance for a sun below the horizon; zeroing the latter
+    #is a deliberate departure.  The elevation is tested rather than the cosine, which is
+    #not exactly 0 at an elevation of 0.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(sunelev > 0, math.pi * esdist ** 2 / (esun * cosZenith), 0)
+    return (gain * factor).astype(np.float32), (bias * factor).astype(np.float32)
+
+
+#Calibrate a (bands, rows, cols) block of DNs; DN 0 is fill and stays 0
+def calibrate_block(dn, scale, offset):
+    toa = dn.astype(np.float32)
+    toa *= scale[:, None, None]
+    toa += offset[:, None, None]
+    toa[dn == 0] = 0
+    return toa
+
+
+#Calibrate the given layers (1-based) of a DN stack (usually a VRT) and write a multi-band float TOA raster
+#(only of the part covering aoi, if given)
+def calibrate_scene(stack_path, layers, scale, offset, out_path, aoi=None):
+    with rasterio.open(stack_path) as src:
+        with raster_io.create_like(out_path, raster_io.clip_grid(src, aoi), len(layers), 'float32', nodata=0) as dst:
+            for window in raster_io.block_windows([dst, src], 2 * len(layers)):
+                dn = raster_io.read_aligned(src, window, dst, list(layers))
+                dst.write(calibrate_block(dn, scale, offset), window=window)
+    raster_io.commit_output(out_path)
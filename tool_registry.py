@@ -0,0 +1,112 @@
+#Locations of the external executables (ERDAS modeler / imagecommand / imgcopy and
+#Fmask).  A tool is resolved, in order, from
+#  - tools.json in the workspace ({"imgcopy": "D:/ERDAS/bin/imgcopy.exe", ...})
+#  - an environment variable (GOES_<TOOL>, e.g. GOES_IMGCOPY)
+#  - the PATH
+#  - tool_cache.json in the workspace, if the cached file still exists with the
+#    size and mtime it had when it was found (a reinstall or upgrade invalidates it)
+#  - a search of the tool's install folders, limited to a few levels deep
+#and a path found by the search is written to the cache.
+
+import json
+import os
+import shutil
+
+CONFIG_NAME = 'tools.json'
+CACHE_NAME = 'tool_cache.json'
+
+#Folders the data live in; never searched for executables
+DATA_FOLDERS = ['Raw_data', 'Stacks', 'Toa_ref', 'MSAVI', 'NDVI', 'WDRI', 'FMask_data', 'external_files']
+
+#tool name -> executable name, where to search ('erdas' = the Hexagon install
+#folders, 'workspace' = the workspace itself) and how many folder levels deep
+TOOLS = {
+    'modeler': ('modeler.exe', 'erdas', 5),
+    'imagecommand': ('imagecommand.exe', 'erdas', 5),
+    'imgcopy': ('imgcopy.exe', 'erdas', 5),
+    'fmask': ('Fmask.exe', 'workspace', 2),
+}
+
+
+def _state(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime]
+
+
+def _load(path):
+    try:
+        f = open(path, 'r')
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return {}
+
+
+def _search_roots(where, workspace):
+    if where == 'workspace':
+        return [workspace]
+    roots = []
+    for variable, default in [('ProgramFiles', 'C:/Program Files'), ('ProgramFiles(x86)', 'C:/Program Files (x86)')]:
+        root = os.path.join(os.environ.get(variable, default), 'Hexagon').replace('\\', '/')
+        if root not in roots:
+            roots.append(root)
+    return roots
+
+
+#first file called exe_name under root, at most depth folder levels down
+def _search(root, exe_name, depth):
+    exe_name = exe_name.lower()
+    level = [root]
+    for _ in range(depth + 1):
+        subdirs = []
+        for folder in level:
+            try:
+                entries = sorted(os.scandir(folder), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file() and entry.name.lower() == exe_name:
+                    return entry.path.replace('\\', '/')
+                if entry.is_dir() and entry.name not in DATA_FOLDERS:
+                    subdirs.append(entry.path)
+        level = subdirs
+    return None
+
+
+class ToolRegistry(object):
+    def __init__(self, workspace):
+        self.workspace = workspace.replace('\\', '/')
+        self.config = _load(os.path.join(self.workspace, CONFIG_NAME))
+        self.cachePath = os.path.join(self.workspace, CACHE_NAME)
+        self.cache = _load(self.cachePath)
+
+    #path of the tool, None if it cannot be found
+    def find(self, name):
+        exeName, where, depth = TOOLS[name]
+        for candidate in [self.config.get(name), os.environ.get('GOES_' + name.upper())]:
+            if candidate and os.path.isfile(candidate):
+                return candidate.replace('\\', '/')
+        onPath = shutil.which(exeName)
+        if onPath:
+            return onPath.replace('\\', '/')
+
+        entry = self.cache.get(name)
+        if entry is not None and os.path.isfile(entry['path']) and _state(entry['path']) == entry['state']:
+            return entry['path']
+
+        for root in _search_roots(where, self.workspace):
+            path = _search(root, exeName, depth)
+            if path:
+                self.cache[name] = {'path': path, 'state': _state(path)}
+                self._save()
+                return path
+        return None
+
+    def _save(self):
+        tmpPath = self.cachePath + '.tmp'
+        f = open(tmpPath, 'w')
+        json.dump(self.cache, f, indent=1)
+        f.close()
+        os.replace(tmpPath, self.cachePath)
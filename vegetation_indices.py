@@ -0,0 +1,141 @@
+#Native NDVI, MSAVI and WDRI calculation, matching the ERDAS _ndvi, _msavi and
+#_wdri models.  process_scene is the fused single-pass mode: each block of the
+#raw band files is read once, calibrated to TOA reflectance in memory and all
+#requested products (TOA, indices, Fmask-masked indices) are written from that
+#same block.
+#Index products are stored as float32 or, with storage='int16', as scaled integers
+#(see raster_io.INDEX_STORAGES); masking keeps the storage of its input.
+#Given an area of interest (aoi, see area_of_interest.py), a stage reads and writes
+#only the part of its input covering it.
+
+import numpy as np
+import rasterio
+
+import raster_io
+import toa_reflectance
+
+#Positions of the red and near infrared layers in a TOA raster (n1(3) and n1(4) in the models)
+RED = 2
+NIR = 3
+
+
+#NDVI, zero where undefined or outside [-1, 1]
+def ndvi(red, nir):
+    return _ratio(nir - red, nir + red)
+
+
+#WDRI, NDVI with the NIR term weighted by 0.1
+def wdri(red, nir):
+    return _ratio(nir * 0.1 - red, nir * 0.1 + red)
+
+
+#MSAVI2
+def msavi(red, nir):
+    a = 2 * nir + 1
+    with np.errstate(invalid='ignore'):
+        return ((a - np.sqrt(a * a - 8 * (nir - red))) / 2).astype(np.float32)
+
+
+def _ratio(num, den):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(den == 0, 0, num / den).astype(np.float32)
+    out[(out < -1) | (out > 1)] = 0
+    return out
+
+
+INDICES = {'msavi': msavi, 'ndvi': ndvi, 'wdri': wdri}
+
+
+#keep values where the Fmask code is 0 (clear land) and set everything else to 0,
+#as the ERDAS 'EITHER $ndvi IF ($fmask == 0) OR 0 OTHERWISE' model did.  0 is also
+#0 in the scaled int16 storage, so values may be stored or real values.
+def apply_mask(values, mask):
+    return np.where(mask == 0, values, 0).astype(values.dtype)
+
+
+#Write one index from the red and NIR layers of a TOA raster (or a Sentinel DN stack)
+def index_scene(layers_path, index, out_path, storage='float32', aoi=None):
+    with rasterio.open(layers_path) as src:
+        with raster_io.create_index(out_path, raster_io.clip_grid(src, aoi), storage) as dst:
+            for window in raster_io.block_windows([dst, src], 3):
+                red, nir = raster_io.read_aligned(src, window, dst, [RED + 1, NIR + 1]).astype(np.float32)
+                dst.write(raster_io.encode_index(INDICES[index](red, nir), storage), 1, window=window)
+    raster_io.commit_output(out_path)
+
+
+#Standalone masking of an existing index raster with an Fmask raster (read on the
+#index raster's grid if the two differ in extent)
+def mask_scene(index_path, mask_path, out_path, aoi=None):
+    with rasterio.open(index_path) as src, rasterio.open(mask_path) as maskSrc:
+        with raster_io.create_like(out_path, raster_io.clip_grid(src, aoi), 1, src.dtypes[0], nodata=src.nodata) as dst:
+            dst.scales = src.scales
+            dst.offsets = src.offsets
+            for window in raster_io.block_windows([dst, src, maskSrc], 2):
+                mask = raster_io.read_aligned(maskSrc, window, dst)
+                dst.write(apply_mask(raster_io.read_aligned(src, window, dst), mask), 1, window=window)
+    raster_io.commit_output(out_path)
+
+
+#Fused TOA -> index processing of one scene.
+#band_paths are the raw band files in stack order and toa_bands the positions in
+#band_paths of the calibrated layers; index_paths maps index names to output files.
+#If mask_path (an Fmask raster of the scene) is given, masked_paths maps index names
+#to the masked outputs, which are written from the same block as the plain ones.
+#The TOA raster is only written if a path is given for it, and only the bands the
+#requested outputs need are read.  The TOA raster is always float32; the index
+#outputs are stored as storage.
+def process_scene(band_paths, toa_bands, scale, offset, index_paths, toa_path=None, mask_path=None, masked_paths=None,
+                  storage='float32', aoi=None):
+    if not mask_path:
+        masked_paths = {}
+    if toa_path:
+        needed = list(toa_bands)
+    else:
+        needed = [toa_bands[RED], toa_bands[NIR]]
+    sources = dict((pos, rasterio.open(band_paths[pos])) for pos in needed)
+    outputs = {}
+    maskedOutputs = {}
+    maskSrc = None
+    try:
+        #the outputs are on the grid of the first band read, cut to aoi
+        template = raster_io.clip_grid(sources[needed[0]], aoi)
+        if masked_paths:
+            maskSrc = rasterio.open(mask_path)
+            for name, path in masked_paths.items():
+                maskedOutputs[name] = raster_io.create_index(path, template, storage)
+        if toa_path:
+            outputs['toa'] = raster_io.create_like(toa_path, template, len(toa_bands), 'float32', nodata=0)
+        for name, path in index_paths.items():
+            outputs[name] = raster_io.create_index(path, template, storage)
+
+        grid = list(outputs.values())[0]
+        datasets = list(outputs.values()) + list(maskedOutputs.values()) + list(sources.values()) + \
+            ([maskSrc] if maskSrc else [])
+        for window in raster_io.block_windows(datasets, 2 * len(needed) + 5):
+            dn = dict((pos, raster_io.read_aligned(src, window, grid)) for pos, src in sources.items())
+            if toa_path:
+                toa = toa_reflectance.calibrate_block(np.stack([dn[pos] for pos in toa_bands]), scale, offset)
+                outputs['toa'].write(toa, window=window)
+                red, nir = toa[RED], toa[NIR]
+            else:
+                layers = [RED, NIR]
+                red, nir = toa_reflectance.calibrate_block(
+                    np.stack([dn[toa_bands[layer]] for layer in layers]), scale[layers], offset[layers])
+            mask = raster_io.read_aligned(maskSrc, window, grid) if maskSrc else None
+            for name in set(index_paths) | set(masked_paths):
+                values = raster_io.encode_index(INDICES[name](red, nir), storage)
+                if name in index_paths:
+                    outputs[name].write(values, 1, window=window)
+                if name in masked_paths:
+                    maskedOutputs[name].write(apply_mask(values, mask), 1, window=window)
+    finally:
+        for dst in list(outputs.values()) + list(maskedOutputs.values()):
+            dst.close()
+        if maskSrc:
+            maskSrc.close()
+        for src in sources.values():
+            src.close()
+
+    for path in [toa_path] + list(index_paths.values()) + list(masked_paths.values()):
+        if path:
+            raster_io.commit_output(path)